@@ -0,0 +1,179 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+from fastapi import HTTPException, status
+
+from core.rabbitmq import get_transport
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURACIÓN ---
+# Límite por cliente (token bucket): pedidos/segundo sostenidos y ráfaga máxima
+ORDER_RATE_LIMIT = float(os.getenv("ORDER_RATE_LIMIT", "5"))
+ORDER_RATE_BURST = float(os.getenv("ORDER_RATE_BURST", "20"))
+# "customer_id" (cuerpo del pedido) o "sub" (claim del JWT)
+ORDER_RATE_LIMIT_KEY = os.getenv("ORDER_RATE_LIMIT_KEY", "customer_id")
+MAX_TRACKED_CLIENTS = 100_000
+
+# Límite global: profundidad de la cola que alimenta el worker más lento.
+# Los umbrales salen de la espera máxima aceptable en la cola (ADMISSION_TARGET_WAIT) y del
+# ritmo de consumo medido. Hasta tener una medición se usan HIGH/LOW, que por defecto son
+# esos mismos 30 s al ritmo nominal del inventory-service (INVENTORY_PREFETCH=200 pedidos
+# de ~5 s cada uno = 40 pedidos/s).
+ADMISSION_QUEUE = os.getenv("ADMISSION_QUEUE", "q_inventory")
+ADMISSION_TARGET_WAIT = float(os.getenv("ADMISSION_TARGET_WAIT", "30"))
+ADMISSION_QUEUE_HIGH = int(os.getenv("ADMISSION_QUEUE_HIGH", "1200"))
+ADMISSION_QUEUE_LOW = int(os.getenv("ADMISSION_QUEUE_LOW", "960"))
+# Piso del umbral calculado: una medición baja no debe rechazar ráfagas pequeñas
+ADMISSION_QUEUE_MIN = int(os.getenv("ADMISSION_QUEUE_MIN", "100"))
+ADMISSION_SAMPLE_INTERVAL = float(os.getenv("ADMISSION_SAMPLE_INTERVAL", "2"))
+MAX_RETRY_AFTER = 60
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Consume un token. Devuelve 0 si se admite o los segundos hasta el próximo token."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Un token bucket por cliente. Los clientes inactivos se olvidan (LRU)."""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = MAX_TRACKED_CLIENTS, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self.buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    def check(self, key: str) -> float:
+        now = self.clock()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst, now)
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket.take(now)
+
+
+class QueueDepthMonitor:
+    """Muestrea en segundo plano la profundidad de una cola del transporte de eventos.
+
+    Con histéresis: se entra en sobrecarga al superar `high` y se sale al bajar de `low`.
+    Si el broker no responde se deja de rechazar (los datos ya no son fiables).
+
+    Con `target_wait`, `high` es lo que el worker consume en ese tiempo. El consumo se mide
+    solo con mensajes esperando en ambas muestras: con el prefetch acotado eso significa que
+    el worker está saturado, y lo que sale de la cola por segundo es su capacidad real.
+    """
+
+    def __init__(self, queue_name: str, high: int, low: int, interval: float,
+                 target_wait: float = None, min_high: int = ADMISSION_QUEUE_MIN):
+        self.queue_name = queue_name
+        self.high = high
+        self.low = low
+        self.low_ratio = low / high
+        self.target_wait = target_wait
+        self.min_high = min_high
+        self.interval = interval
+        self.depth = None
+        self.drain_rate = None   # mensajes/segundo que consume el worker saturado (promedio móvil)
+        self.overloaded = False
+        self.sampled_at = None
+        self._published = 0      # publicados por este gateway desde la última muestra
+
+    def note_published(self, count: int = 1):
+        self._published += count
+
+    def update(self, depth: int, now: float = None):
+        now = time.monotonic() if now is None else now
+        published, self._published = self._published, 0
+        if self.depth and depth and self.sampled_at is not None and now > self.sampled_at:
+            consumed = (self.depth + published - depth) / (now - self.sampled_at)
+            if consumed > 0:
+                self.drain_rate = consumed if self.drain_rate is None else 0.7 * self.drain_rate + 0.3 * consumed
+        if self.drain_rate and self.target_wait:
+            self.high = max(self.min_high, math.ceil(self.drain_rate * self.target_wait))
+            self.low = math.floor(self.high * self.low_ratio)
+        self.depth = depth
+        self.sampled_at = now
+
+        if depth >= self.high:
+            self.overloaded = True
+        elif depth <= self.low:
+            self.overloaded = False
+
+    def is_overloaded(self) -> bool:
+        if self.sampled_at is None or time.monotonic() - self.sampled_at > 3 * self.interval:
+            return False
+        return self.overloaded
+
+    def retry_after(self) -> int:
+        # Tiempo estimado hasta bajar de `low` al ritmo de vaciado observado
+        if self.drain_rate and self.depth is not None:
+            return max(1, min(MAX_RETRY_AFTER, math.ceil((self.depth - self.low) / self.drain_rate)))
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(self.interval * 5)))
+
+    async def run(self):
+        while True:
+            try:
+                transport = await get_transport()
+                self.update(await transport.queue_depth(self.queue_name))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f" [!] No se pudo muestrear la cola {self.queue_name}: {e}")
+            await asyncio.sleep(self.interval)
+
+
+limiter = RateLimiter(ORDER_RATE_LIMIT, ORDER_RATE_BURST)
+queue_monitor = QueueDepthMonitor(
+    ADMISSION_QUEUE, ADMISSION_QUEUE_HIGH, ADMISSION_QUEUE_LOW, ADMISSION_SAMPLE_INTERVAL,
+    target_wait=ADMISSION_TARGET_WAIT
+)
+
+
+def admit_order(customer_id: str, token_payload: dict):
+    """Admisión de POST /orders: 503 si el sistema está saturado, 429 si el cliente excede su cuota."""
+    if queue_monitor.is_overloaded():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sistema saturado, intente más tarde",
+            headers={"Retry-After": str(queue_monitor.retry_after())},
+        )
+
+    key = f"customer:{customer_id}"
+    if ORDER_RATE_LIMIT_KEY == "sub" and token_payload.get("sub"):
+        key = f"sub:{token_payload['sub']}"
+
+    wait = limiter.check(key)
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiados pedidos, intente más tarde",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+
+def order_published():
+    """Cuenta un pedido publicado: el monitor lo necesita para medir el consumo del worker."""
+    queue_monitor.note_published()
@@ -0,0 +1,301 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from common import csvrecords
+from common.csvrecords import ends_inside_quotes
+
+# Mismas columnas que exige process_csv en el legacy-service
+REQUIRED_COLS = ["order_id", "customer_id", "amount"]
+IMPORT_BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", "1000"))
+MAX_TRACKED_IMPORTS = 1000
+# Id elegido por el cliente (cabecera X-Import-Id) para poder consultar el avance durante la subida
+IMPORT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+logger = logging.getLogger(__name__)
+
+# Estado de las importaciones (en memoria, por proceso del gateway)
+IMPORTS: dict[str, dict] = {}
+
+
+class CsvImportError(ValueError):
+    """El contenido subido no es un CSV importable (error del cliente)."""
+
+
+def new_import_id(requested: str = None) -> str:
+    if requested is None:
+        return str(uuid.uuid4())
+    if not IMPORT_ID_PATTERN.match(requested):
+        raise CsvImportError("X-Import-Id inválido (1-64 caracteres: letras, números, '-' o '_')")
+    return requested
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _track(import_id: str) -> dict:
+    # Solo recordamos las últimas MAX_TRACKED_IMPORTS importaciones
+    while len(IMPORTS) >= MAX_TRACKED_IMPORTS:
+        IMPORTS.pop(next(iter(IMPORTS)))
+    IMPORTS[import_id] = {
+        "import_id": import_id,
+        # RECEIVING -> UPLOADED (todo publicado) -> LOADED (visible en orders) | FAILED
+        "status": "RECEIVING",
+        "bytes_received": 0,
+        "rows_received": 0,
+        "batches_published": 0,
+        # Avance informado por el legacy-service (eventos import_status.*)
+        "batches_staged": 0,
+        "rows_staged": 0,
+        "rows_rejected": 0,
+        "rows_loaded": None,
+        "rows_duplicated": None,
+        "started_at": _now(),
+        "uploaded_at": None,
+        "finished_at": None,
+        "error": None,
+    }
+    return IMPORTS[import_id]
+
+
+class CsvImportPipeline:
+    """Convierte un CSV que llega por partes en lotes de eventos 'import.batch'.
+
+    Nunca guarda más que un lote y el registro incompleto en curso (acotado a
+    CSV_MAX_RECORD_BYTES): cada lote se publica (await) antes de seguir leyendo, así la
+    subida avanza al ritmo del broker.
+    La validación de filas la hace el legacy-service con las mismas reglas que process_csv.
+    """
+
+    def __init__(self, import_id: str, publish, batch_rows: int = None):
+        self.import_id = import_id
+        self.publish = publish
+        self.batch_rows = batch_rows or IMPORT_BATCH_ROWS
+        self.status = _track(import_id)
+        self._pending = b""     # bytes después del último salto de línea
+        self._record = b""      # registro con un campo entre comillas aún abierto
+        self._in_quotes = False
+        self._lines = []
+        self._columns = None    # índice de cada columna requerida en el CSV
+        self._seq = 0
+
+    async def feed(self, data: bytes):
+        self.status["bytes_received"] += len(data)
+        *lines, self._pending = (self._pending + data).split(b"\n")
+        for line in lines:
+            await self._add_line(line + b"\n")
+        self._check_size(len(self._record) + len(self._pending))
+
+    async def finish(self):
+        if self._pending:
+            await self._add_line(self._pending)
+            self._pending = b""
+        if self._record:
+            await self._add_record(self._record)
+            self._record = b""
+        if self._columns is None:
+            raise CsvImportError("Archivo vacío")
+        await self._flush()
+
+        # Antes de publicar: la confirmación del legacy-service puede llegar enseguida
+        self.status["status"] = "UPLOADED"
+        self.status["uploaded_at"] = _now()
+        await self.publish(self._event("ImportCompleted", {
+            "batches": self._seq,
+            "rows": self.status["rows_received"],
+        }), "import.completed")
+
+    async def fail(self, error: str):
+        self.status["status"] = "FAILED"
+        self.status["error"] = error
+        self.status["finished_at"] = _now()
+        if not self._seq:
+            return
+        # Ya se publicaron lotes: el legacy-service los tiene en staging y debe descartarlos
+        try:
+            await self.publish(self._event("ImportFailed", {"error": error}), "import.failed")
+        except Exception as e:
+            logger.error(f" [!] No se pudo publicar la cancelación de la importación {self.import_id}: {e}")
+
+    @staticmethod
+    def _check_size(size: int):
+        if size > csvrecords.MAX_RECORD_BYTES:
+            raise CsvImportError(
+                f"Registro CSV de más de {csvrecords.MAX_RECORD_BYTES} bytes (¿comillas sin cerrar?)"
+            )
+
+    async def _add_line(self, line: bytes):
+        # Un campo entre comillas puede contener saltos de línea: completamos el registro.
+        # Las comillas se siguen como en el parser de csv (solo abren al inicio de un campo)
+        self._record += line
+        self._in_quotes = ends_inside_quotes(line, self._in_quotes)
+        self._check_size(len(self._record))
+        if not self._in_quotes:
+            record, self._record = self._record, b""
+            await self._add_record(record)
+
+    async def _add_record(self, record: bytes):
+        if not record.strip():
+            return
+        if self._columns is None:
+            header = next(self._parse(record.decode("utf-8-sig")))
+            header = [col.strip() for col in header]
+            if not all(col in header for col in REQUIRED_COLS):
+                raise CsvImportError(f"Faltan columnas requeridas: {REQUIRED_COLS}")
+            self._columns = [header.index(col) for col in REQUIRED_COLS]
+            return
+
+        self._lines.append(record.decode("utf-8"))
+        if len(self._lines) >= self.batch_rows:
+            await self._flush()
+
+    async def _flush(self):
+        if not self._lines:
+            return
+        rows = [
+            # Campos vacíos -> None, igual que NaN al leer con pandas
+            [(row[i] or None) if i < len(row) else None for i in self._columns]
+            for row in self._parse("".join(self._lines))
+        ]
+        self._lines = []
+        self._seq += 1
+        await self.publish(self._event("ImportBatch", {
+            "seq": self._seq,
+            "first_row": self.status["rows_received"],
+            "columns": REQUIRED_COLS,
+            "rows": rows,
+        }), "import.batch")
+        self.status["rows_received"] += len(rows)
+        self.status["batches_published"] = self._seq
+
+    @staticmethod
+    def _parse(text: str):
+        # csv.Error (p. ej. un campo de más de 128 KiB) no es un ValueError: también es del cliente
+        try:
+            return iter(list(csv.reader(io.StringIO(text))))
+        except csv.Error as e:
+            raise CsvImportError(f"CSV inválido: {e}") from e
+
+    def _event(self, event_type: str, data: dict) -> dict:
+        return {
+            "event_id": str(uuid.uuid4()),
+            "event_type": event_type,
+            "correlation_id": self.import_id,
+            "data": {"import_id": self.import_id, **data},
+        }
+
+
+def apply_import_status(event: dict):
+    """Actualiza IMPORTS con el avance que publica el legacy-service."""
+    data = event.get("data", {})
+    status = IMPORTS.get(data.get("import_id"))
+    if status is None:
+        return
+    for field in ("batches_staged", "rows_staged", "rows_rejected", "rows_loaded", "rows_duplicated"):
+        if field in data:
+            status[field] = data[field]
+    if event.get("stage") == "loaded":
+        status["status"] = "LOADED"
+        status["finished_at"] = _now()
+    elif event.get("stage") == "aborted" and status["status"] != "FAILED":
+        status["status"] = "FAILED"
+        status["error"] = data.get("error")
+        status["finished_at"] = _now()
+
+
+async def handle_import_status(message):
+    async with message.process():
+        event = json.loads(message.body)
+        event["stage"] = message.routing_key.rsplit(".", 1)[-1]
+        apply_import_status(event)
+
+
+async def follow_import_status(get_transport, retry_interval=5):
+    """Suscribe el gateway a import_status.* (cola propia y no durable por proceso)."""
+    queue = f"q_gateway_import_status_{uuid.uuid4().hex[:8]}"
+    while True:
+        try:
+            transport = await get_transport()
+            await transport.subscribe(queue, ["import_status.#"], handle_import_status, durable=False)
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f" [!] No se pudo suscribir al avance de importaciones: {e}")
+            await asyncio.sleep(retry_interval)
+
+
+class _MultipartFileReader:
+    """Extrae en streaming el contenido del campo 'file' de un multipart/form-data."""
+
+    def __init__(self, boundary: bytes):
+        self.chunks = []
+        self.found = False
+        self._in_file = False
+        self._field = b""
+        self._value = b""
+        self.parser = MultipartParser(boundary, {
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        if self._field.lower() == b"content-disposition":
+            _, options = parse_options_header(self._value)
+            self._in_file = options.get(b"name") == b"file" and not self.found
+        self._field = b""
+        self._value = b""
+
+    def _on_part_data(self, data, start, end):
+        if self._in_file:
+            self.chunks.append(bytes(data[start:end]))
+
+    def _on_part_end(self):
+        if self._in_file:
+            self.found = True
+            self._in_file = False
+
+
+async def iter_upload(request):
+    """Devuelve el CSV subido por partes, ya sea cuerpo crudo (chunked) o multipart."""
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        async for chunk in request.stream():
+            if chunk:
+                yield chunk
+        return
+
+    _, params = parse_options_header(content_type)
+    if not params.get(b"boundary"):
+        raise CsvImportError("Cabecera multipart sin boundary")
+
+    reader = _MultipartFileReader(params[b"boundary"])
+    async for chunk in request.stream():
+        reader.parser.write(chunk)
+        if reader.chunks:
+            data = b"".join(reader.chunks)
+            reader.chunks.clear()
+            yield data
+    reader.parser.finalize()
+    if reader.chunks:
+        yield b"".join(reader.chunks)
+    if not reader.found:
+        raise CsvImportError("El formulario debe incluir el archivo en el campo 'file'")
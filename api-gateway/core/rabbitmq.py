@@ -1,31 +1,33 @@
-import os
-import aio_pika
-import json
+import asyncio
 
-# CAMBIO CLAVE: En Docker, el host es 'rabbitmq' (nombre del servicio).
-# En local, usamos 'localhost'.
-RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq")
-RABBITMQ_USER = os.getenv("RABBITMQ_DEFAULT_USER", "user")
-RABBITMQ_PASS = os.getenv("RABBITMQ_DEFAULT_PASS", "password")
+from common.transport import AmqpTransport
 
-RABBITMQ_URL = f"amqp://{RABBITMQ_USER}:{RABBITMQ_PASS}@{RABBITMQ_HOST}/"
+# Transporte compartido: abrir una conexión AMQP por mensaje es inviable cuando
+# una importación publica miles de lotes seguidos. Por defecto RabbitMQ
+# (RABBITMQ_HOST: 'rabbitmq' en Docker, 'localhost' en local); single_node.py
+# instala un InProcessTransport con set_transport().
+_transport = None
+_lock = asyncio.Lock()
 
-async def publish_event(event: dict, routing_key: str):
-    # connect_robust ayuda a reconectar si Rabbit se cae momentáneamente
-    connection = await aio_pika.connect_robust(RABBITMQ_URL)
-    async with connection:
-        channel = await connection.channel()
+def set_transport(transport):
+    global _transport
+    _transport = transport
+
+async def get_transport():
+    global _transport
+    async with _lock:
+        if _transport is None:
+            transport = AmqpTransport()
+            await transport.connect()
+            _transport = transport
+    return _transport
 
-        # Declaramos el exchange aquí también por seguridad (Idempotencia)
-        exchange = await channel.declare_exchange(
-            "integrahub.events",
-            aio_pika.ExchangeType.TOPIC
-        )
+async def close_connection():
+    global _transport
+    if _transport is not None:
+        await _transport.close()
+    _transport = None
 
-        await exchange.publish(
-            aio_pika.Message(
-                body=json.dumps(event).encode(),
-                content_type="application/json"
-            ),
-            routing_key=routing_key
-        )
\ No newline at end of file
+async def publish_event(event: dict, routing_key: str):
+    transport = await get_transport()
+    await transport.publish(event, routing_key)
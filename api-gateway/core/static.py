@@ -0,0 +1,153 @@
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+from pathlib import Path
+
+from starlette.responses import PlainTextResponse, Response
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli se sirve solo gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURACIÓN ---
+# Assets que no son HTML (el HTML siempre se revalida con el ETag)
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "3600"))
+# Por debajo de este tamaño no compensa comprimir
+MIN_COMPRESS_SIZE = 256
+
+
+class StaticAsset:
+    __slots__ = ("content_type", "cache_control", "variants")
+
+    def __init__(self, content_type: str, cache_control: str, variants: dict):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        # encoding ("identity", "br", "gzip") -> (cuerpo, ETag)
+        self.variants = variants
+
+    def matches(self, if_none_match: str, encoding: str) -> bool:
+        """¿El cliente ya tiene la variante `encoding`? Solo vale el ETag de esa codificación:
+        un ETag de la versión gzip no sirve a un cliente que ahora pide identity."""
+        if if_none_match.strip() == "*":
+            return True
+        # If-None-Match usa comparación débil: se ignora el prefijo W/
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return self.variants[encoding][1] in tags
+
+
+def _compress(data: bytes) -> dict:
+    variants = {}
+    if len(data) < MIN_COMPRESS_SIZE:
+        return variants
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    # mtime=0: la misma entrada produce siempre los mismos bytes (y el mismo ETag)
+    variants["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+    # Solo se guardan las variantes que realmente ahorran bytes
+    return {enc: body for enc, body in variants.items() if len(body) < len(data)}
+
+
+def load_asset(path: Path) -> StaticAsset:
+    data = path.read_bytes()
+    content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+        content_type += "; charset=utf-8"
+
+    # ETag fuerte por contenido; cada codificación es una representación distinta
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    variants = {"identity": (data, f'"{digest}"')}
+    for encoding, body in _compress(data).items():
+        variants[encoding] = (body, f'"{digest}-{encoding}"')
+
+    if content_type.startswith("text/html"):
+        cache_control = "no-cache"
+    else:
+        cache_control = f"public, max-age={STATIC_MAX_AGE}"
+    return StaticAsset(content_type, cache_control, variants)
+
+
+def parse_accept_encoding(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticFiles:
+    """Sirve un directorio desde memoria, precomprimido (brotli/gzip) al arrancar.
+
+    Reemplaza a StaticFiles(html=True): "/" y los directorios sirven su index.html.
+    Cada respuesta lleva ETag fuerte, Cache-Control y Vary: Accept-Encoding, y un
+    If-None-Match que coincide responde 304 sin cuerpo. Los cambios en el directorio
+    se ven al reiniciar el proceso.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.assets = {}
+        for path in sorted(self.directory.rglob("*")):
+            relative = path.relative_to(self.directory)
+            if path.is_file() and not any(part.startswith(".") for part in relative.parts):
+                self.assets[relative.as_posix()] = load_asset(path)
+
+        raw = sum(len(a.variants["identity"][0]) for a in self.assets.values())
+        logger.info(f" [📦] {len(self.assets)} archivos estáticos en memoria ({raw} bytes, brotli={'sí' if brotli else 'no'})")
+
+    def lookup(self, path: str):
+        path = path.strip("/")
+        asset = self.assets.get(path)
+        if asset is None:
+            asset = self.assets.get(f"{path}/index.html" if path else "index.html")
+        return asset
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+            await response(scope, receive, send)
+            return
+
+        asset = self.lookup(scope["path"].removeprefix(scope.get("root_path", "")))
+        if asset is None:
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        headers = {}
+        for name, value in scope["headers"]:
+            headers[name.decode("latin-1")] = value.decode("latin-1")
+
+        accepted = parse_accept_encoding(headers.get("accept-encoding", ""))
+        encoding = next((enc for enc in ("br", "gzip") if enc in accepted and enc in asset.variants), "identity")
+        body, etag = asset.variants[encoding]
+
+        response_headers = {
+            "etag": etag,
+            "cache-control": asset.cache_control,
+            "vary": "Accept-Encoding",
+        }
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and asset.matches(if_none_match, encoding):
+            await Response(status_code=304, headers=response_headers)(scope, receive, send)
+            return
+
+        if encoding != "identity":
+            response_headers["content-encoding"] = encoding
+        response_headers["content-length"] = str(len(body))
+        if scope["method"] == "HEAD":
+            body = b""
+        response = Response(body, headers=response_headers, media_type=asset.content_type)
+        await response(scope, receive, send)
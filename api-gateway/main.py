@@ -1,15 +1,38 @@
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.security import OAuth2PasswordRequestForm # <--- NUEVO
 
 # Importamos routers y lógica de auth
 from routers.orders import router as orders_router
+from routers.imports import router as imports_router
+from routers.admin import router as admin_router
+from core.rabbitmq import close_connection, get_transport
+from core.imports import follow_import_status
+from core.admission import queue_monitor
+from core.static import PrecompressedStaticFiles
+from common import diagnostics
 from auth import validate_jwt, create_access_token, Token # <--- NUEVO
 
 # --- CONFIGURACIÓN DE APP ---
-app = FastAPI(title="IntegraHub API Gateway", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Detector de bloqueos del loop y profiler (solo con INTEGRAHUB_DIAGNOSTICS=1)
+    diagnostics.install("api-gateway")
+    # Muestreo en segundo plano de la cola de inventario (control de admisión)
+    monitor_task = asyncio.create_task(queue_monitor.run())
+    # Avance de las importaciones que informa el legacy-service (GET /imports/{id})
+    import_status_task = asyncio.create_task(follow_import_status(get_transport))
+    yield
+    monitor_task.cancel()
+    import_status_task.cancel()
+    diagnostics.uninstall()
+    # Cerramos la conexión compartida a RabbitMQ al apagar
+    await close_connection()
+
+app = FastAPI(title="IntegraHub API Gateway", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -49,6 +72,14 @@ app.include_router(
     orders_router,
     dependencies=[Depends(validate_jwt)] # <--- ESTO PROTEGE LA API
 )
+app.include_router(
+    imports_router,
+    dependencies=[Depends(validate_jwt)]
+)
+app.include_router(
+    admin_router,
+    dependencies=[Depends(validate_jwt)]
+)
 
 # --- 4. FRONTEND ---
 current_file = Path(__file__).resolve()
@@ -58,4 +89,5 @@ local_path = current_dir.parent / "frontend-portal"
 static_dir = docker_path if docker_path.exists() else (local_path if local_path.exists() else None)
 
 if static_dir:
-    app.mount("/", StaticFiles(directory=str(static_dir), html=True), name="frontend")
\ No newline at end of file
+    # Precomprimido y en memoria, con ETag y Cache-Control (ver core/static.py)
+    app.mount("/", PrecompressedStaticFiles(static_dir), name="frontend")
\ No newline at end of file
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+import asyncio
+
+from core.security import validate_jwt
+from common import diagnostics
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+def require_diagnostics():
+    diag = diagnostics.get_diagnostics()
+    if diag is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Diagnóstico deshabilitado (activar con INTEGRAHUB_DIAGNOSTICS=1)"
+        )
+    return diag
+
+@router.get("/diagnostics")
+async def get_diagnostics(
+    diag = Depends(require_diagnostics),
+    token_payload: dict = Depends(validate_jwt)
+):
+    """Bloqueos del event loop detectados (con pila y handler) y estado del profiler."""
+    return {
+        "service": diag.service,
+        "profiling": diag.profiler.running,
+        "profile_pending": diag.profiler.pending,
+        **diag.stall_detector.stats()
+    }
+
+@router.post("/profile/start", status_code=202)
+async def start_profile(
+    seconds: int = 30,
+    diag = Depends(require_diagnostics),
+    token_payload: dict = Depends(validate_jwt)
+):
+    if diag.profiler.pending:
+        raise HTTPException(status_code=409, detail="Ya hay un perfil en curso")
+    seconds = max(1, min(seconds, diagnostics.MAX_PROFILE_SECONDS))
+    diag.start_profile(max_seconds=seconds)
+    return {"message": "Profiler iniciado", "max_seconds": seconds}
+
+@router.post("/profile/stop", response_class=PlainTextResponse)
+async def stop_profile(
+    diag = Depends(require_diagnostics),
+    token_payload: dict = Depends(validate_jwt)
+):
+    """Detiene el profiler (o recoge el perfil ya vencido) y devuelve las pilas en formato folded."""
+    if not diag.profiler.pending:
+        raise HTTPException(status_code=409, detail="No hay un perfil en curso")
+    # join del hilo y escritura del archivo: fuera del event loop
+    path, folded = await asyncio.to_thread(diag.stop_profile)
+    return PlainTextResponse(folded, headers={"X-Profile-Path": path})
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from core.security import validate_jwt
+from core.rabbitmq import publish_event
+from core.imports import CsvImportError, CsvImportPipeline, IMPORTS, iter_upload, new_import_id
+
+router = APIRouter(prefix="/imports", tags=["Imports"])
+
+@router.post("", status_code=202)
+async def create_import(
+    request: Request,
+    token_payload: dict = Depends(validate_jwt)
+):
+    """
+    Importación histórica de pedidos en CSV (cuerpo crudo/chunked o multipart con campo 'file').
+    El archivo se procesa en streaming: nunca se guarda completo en memoria ni en disco.
+    Con la cabecera X-Import-Id el cliente elige el id y puede consultar GET /imports/{id}
+    mientras sube. Los pedidos aparecen en orders cuando el estado pasa a LOADED.
+    """
+    try:
+        import_id = new_import_id(request.headers.get("x-import-id"))
+    except CsvImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if import_id in IMPORTS:
+        raise HTTPException(status_code=409, detail="Ya existe una importación con ese id")
+    pipeline = CsvImportPipeline(import_id, publish_event)
+
+    try:
+        async for chunk in iter_upload(request):
+            await pipeline.feed(chunk)
+        await pipeline.finish()
+    except ValueError as e:
+        # CSV mal formado, columnas faltantes, multipart inválido, encoding...
+        await pipeline.fail(str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        await pipeline.fail(str(e))
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error publicando importación: {str(e)}"
+        )
+
+    return {
+        "message": "Importación recibida",
+        "import_id": import_id,
+        "rows": pipeline.status["rows_received"],
+        "batches": pipeline.status["batches_published"],
+        "status": pipeline.status["status"]
+    }
+
+@router.get("/{import_id}")
+async def get_import_status(
+    import_id: str,
+    token_payload: dict = Depends(validate_jwt)
+):
+    status = IMPORTS.get(import_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    return status
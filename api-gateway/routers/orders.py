@@ -4,6 +4,7 @@ import uuid
 from models.orders import OrderRequest
 from core.security import validate_jwt
 from core.rabbitmq import publish_event
+from core.admission import admit_order, order_published
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
@@ -12,6 +13,9 @@ async def create_order(
     order: OrderRequest,
     token_payload: dict = Depends(validate_jwt)
 ):
+    # Control de admisión: protege la cola de inventario de ráfagas (429/503 + Retry-After)
+    admit_order(order.customer_id, token_payload)
+
     order_id = str(uuid.uuid4())
     correlation_id = str(uuid.uuid4())
 
@@ -33,6 +37,7 @@ async def create_order(
             status_code=500,
             detail=f"Error publicando evento: {str(e)}"
         )
+    order_published()
 
     return {
         "message": "Pedido recibido",
@@ -0,0 +1,163 @@
+"""Benchmark: orders sin particionar vs. esquema particionado + rollups.
+
+Crea dos esquemas de prueba en la base configurada (DB_HOST, DB_USER, ...):
+  - bench_flat:        la tabla orders original (heap + PK serial)
+  - bench_partitioned: el esquema de common/schema.py (particiones, índices, rollups)
+los llena con BENCH_ROWS pedidos repartidos en los últimos 12 meses y mide
+búsquedas por order_id y consultas de reporte.
+
+Uso (desde la raíz del repo, con Postgres levantado):
+    DB_HOST=localhost BENCH_ROWS=10000000 python benchmarks/bench_orders_schema.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from common.db import get_db_connection
+from common.schema import apply_migrations, ensure_order_partitions
+
+BENCH_ROWS = int(os.getenv("BENCH_ROWS", "10000000"))
+BATCH_ROWS = int(os.getenv("BENCH_BATCH_ROWS", "500000"))
+# Sin índice, cada búsqueda en bench_flat es un seq scan completo: pocas repeticiones
+LOOKUPS = int(os.getenv("BENCH_LOOKUPS", "20"))
+REPEAT = int(os.getenv("BENCH_REPEAT", "5"))
+
+FLAT_DDL = """
+    CREATE TABLE orders (
+        id SERIAL PRIMARY KEY,
+        order_id VARCHAR(50) NOT NULL,
+        customer_id VARCHAR(50),
+        status VARCHAR(20),
+        amount DECIMAL(10, 2),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+# Pedidos sintéticos: 50k clientes, 4 estados, fechas uniformes en el último año
+LOAD_SQL = """
+    INSERT INTO orders (order_id, customer_id, status, amount, created_at)
+    SELECT 'ORD-' || g,
+           'CUST-' || (g %% 50000),
+           (ARRAY['RESERVED', 'CONFIRMED', 'IMPORTED', 'CONFIRMED'])[g %% 4 + 1],
+           round((random() * 400 + 100)::numeric, 2),
+           NOW() - random() * INTERVAL '365 days'
+    FROM generate_series(%s, %s) g
+"""
+
+QUERIES = {
+    "lookup": {
+        "bench_flat": "SELECT status, amount FROM orders WHERE order_id = %(order_id)s",
+        "bench_partitioned": """
+            SELECT status, amount FROM orders
+            WHERE order_id = %(order_id)s
+              AND created_at = (SELECT created_at FROM order_keys WHERE order_id = %(order_id)s)
+        """,
+    },
+    "daily_by_status_30d": {
+        "bench_flat": """
+            SELECT created_at::date, status, count(*), sum(amount) FROM orders
+            WHERE created_at >= CURRENT_DATE - 30 GROUP BY 1, 2
+        """,
+        "bench_partitioned": """
+            SELECT bucket, status, sum(order_count), sum(total_amount) FROM orders_rollup_daily
+            WHERE bucket >= CURRENT_DATE - 30 GROUP BY 1, 2
+        """,
+    },
+    "top_customers_7d": {
+        "bench_flat": """
+            SELECT customer_id, sum(amount) AS revenue FROM orders
+            WHERE status = 'CONFIRMED' AND created_at >= CURRENT_DATE - 7
+            GROUP BY 1 ORDER BY revenue DESC LIMIT 10
+        """,
+        "bench_partitioned": """
+            SELECT customer_id, sum(total_amount) AS revenue FROM orders_rollup_daily
+            WHERE status = 'CONFIRMED' AND bucket >= CURRENT_DATE - 7
+            GROUP BY 1 ORDER BY revenue DESC LIMIT 10
+        """,
+    },
+    "customer_history": {
+        "bench_flat": """
+            SELECT order_id, status, amount FROM orders
+            WHERE customer_id = %(customer_id)s AND created_at >= CURRENT_DATE - 90
+        """,
+        "bench_partitioned": """
+            SELECT order_id, status, amount FROM orders
+            WHERE customer_id = %(customer_id)s AND created_at >= CURRENT_DATE - 90
+        """,
+    },
+}
+
+
+def setup_schema(conn, schema):
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema}")
+    cur.execute(f"SET search_path TO {schema}")
+    if schema == "bench_flat":
+        cur.execute(FLAT_DDL)
+        conn.commit()
+    else:
+        apply_migrations(conn)
+        ensure_order_partitions(cur, since=date.today() - timedelta(days=366))
+        conn.commit()
+
+    started = time.perf_counter()
+    for first in range(1, BENCH_ROWS + 1, BATCH_ROWS):
+        cur.execute(LOAD_SQL, (first, min(first + BATCH_ROWS - 1, BENCH_ROWS)))
+        conn.commit()
+    load_seconds = time.perf_counter() - started
+    cur.execute("ANALYZE")
+    conn.commit()
+    cur.close()
+    return load_seconds
+
+
+def run_query(conn, schema, sql, params_list):
+    cur = conn.cursor()
+    cur.execute(f"SET search_path TO {schema}")
+    timings = []
+    for params in params_list:
+        started = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    cur.close()
+    conn.rollback()
+    return timings
+
+
+def main():
+    conn = get_db_connection()
+    print(f"Cargando {BENCH_ROWS:,} pedidos por esquema...")
+    for schema in ("bench_flat", "bench_partitioned"):
+        seconds = setup_schema(conn, schema)
+        print(f"  {schema:<18} carga: {seconds:8.1f} s ({BENCH_ROWS / seconds:,.0f} filas/s)")
+
+    rng = random.Random(42)
+    lookups = [{"order_id": f"ORD-{rng.randint(1, BENCH_ROWS)}"} for _ in range(LOOKUPS)]
+    customers = [{"customer_id": f"CUST-{rng.randint(0, 49999)}"} for _ in range(LOOKUPS)]
+
+    print(f"\n{'consulta':<22}{'esquema':<20}{'mediana ms':>12}{'p95 ms':>10}")
+    for name, variants in QUERIES.items():
+        if name == "lookup":
+            params = lookups
+        elif name == "customer_history":
+            params = customers
+        else:
+            params = [{}] * REPEAT
+        for schema, sql in variants.items():
+            timings = sorted(run_query(conn, schema, sql, params))
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{name:<22}{schema:<20}{statistics.median(timings):>12.2f}{p95:>10.2f}")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark: tiempo de arranque (time-to-ready) de cada worker.
+
+Lanza cada worker como proceso aparte con READY_FILE definido y mide:
+  - total: desde el spawn hasta que aparece READY_FILE (intérprete + imports + dependencias)
+  - deps:  lo que el propio worker reporta (espera a Postgres/RabbitMQ + esquema + colas declaradas)
+
+Uso (desde la raíz del repo, con Postgres y RabbitMQ levantados):
+    DB_HOST=localhost RABBITMQ_HOST=localhost python benchmarks/bench_startup.py
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+WORKERS = ["inventory-service", "notification-service", "analytics-service", "legacy-service"]
+REPEAT = int(os.getenv("BENCH_REPEAT", "5"))
+TIMEOUT = float(os.getenv("BENCH_STARTUP_TIMEOUT", "60"))
+
+
+def start_once(worker, workdir):
+    ready_file = os.path.join(workdir, f"{worker}.ready")
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(ROOT),
+        READY_FILE=ready_file,
+        INBOX_DIR=os.path.join(workdir, "inbox"),
+        PROCESSED_DIR=os.path.join(workdir, "processed"),
+        ERROR_DIR=os.path.join(workdir, "error"),
+    )
+    os.makedirs(env["INBOX_DIR"], exist_ok=True)
+
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "worker.py"],
+        cwd=ROOT / "workers" / worker,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while not os.path.exists(ready_file):
+            if proc.poll() is not None:
+                raise RuntimeError(f"{worker} terminó antes de estar listo (código {proc.returncode})")
+            if time.perf_counter() - started > TIMEOUT:
+                raise RuntimeError(f"{worker} no estuvo listo en {TIMEOUT:.0f}s")
+            time.sleep(0.005)
+        total = time.perf_counter() - started
+        # El worker escribe el archivo al quedar listo; esperamos a que el contenido esté completo
+        while True:
+            content = Path(ready_file).read_text()
+            if content.endswith("\n"):
+                break
+            time.sleep(0.001)
+        return total, float(content)
+    finally:
+        proc.terminate()
+        proc.wait()
+        if os.path.exists(ready_file):
+            os.remove(ready_file)
+
+
+def main():
+    print(f"{'worker':<24}{'total ms':>12}{'deps ms':>12}{'python+imports ms':>20}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for worker in WORKERS:
+            runs = [start_once(worker, workdir) for _ in range(REPEAT)]
+            total = statistics.median(r[0] for r in runs) * 1000
+            deps = statistics.median(r[1] for r in runs) * 1000
+            print(f"{worker:<24}{total:>12.1f}{deps:>12.1f}{total - deps:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark: latencia end-to-end del transporte de eventos, RabbitMQ vs. en memoria.
+
+Reproduce el camino de un pedido sin tocar la base de datos:
+    publish order.created -> handler "inventory" -> publish order.confirmed -> handler "analytics"
+(con "notifications" escuchando order.#, como en el sistema real) y mide desde el primer
+publish hasta que el último handler recibe la confirmación.
+
+  - secuencial: un pedido en vuelo a la vez (latencia pura por salto)
+  - ráfaga: BENCH_BURST pedidos publicados de golpe (latencia bajo cola + throughput)
+
+Uso (desde la raíz del repo; el backend AMQP se omite si no hay broker):
+    RABBITMQ_HOST=localhost python benchmarks/bench_transport.py
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from common.transport import AmqpTransport, InProcessTransport
+
+MESSAGES = int(os.getenv("BENCH_MESSAGES", "2000"))
+BURST = int(os.getenv("BENCH_BURST", "500"))
+
+
+async def wire(transport):
+    """Suscribe los tres handlers del benchmark y devuelve el diccionario de futures pendientes."""
+    pending = {}
+
+    async def inventory(message):
+        async with message.process():
+            body = json.loads(message.body)
+            await transport.publish({"event_type": "OrderConfirmed", "data": body["data"]}, "bench.order.confirmed")
+
+    async def notifications(message):
+        async with message.process():
+            json.loads(message.body)
+
+    async def analytics(message):
+        async with message.process():
+            body = json.loads(message.body)
+            future = pending.pop(body["data"]["order_id"], None)
+            if future is not None and not future.done():
+                future.set_result(time.perf_counter())
+
+    # Colas no durables: desaparecen al cerrar la conexión
+    await transport.subscribe("bench_inventory", ["bench.order.created"], inventory, durable=False)
+    await transport.subscribe("bench_notifications", ["bench.order.#"], notifications, durable=False)
+    await transport.subscribe("bench_analytics", ["bench.order.confirmed"], analytics, durable=False)
+    return pending
+
+
+async def send(transport, pending, order_id):
+    future = asyncio.get_running_loop().create_future()
+    pending[order_id] = future
+    started = time.perf_counter()
+    event = {"event_type": "OrderCreated", "data": {"order_id": order_id, "customer_id": "BENCH"}}
+    await transport.publish(event, "bench.order.created")
+    return started, future
+
+
+async def run(transport):
+    pending = await wire(transport)
+
+    # Calentamiento (conexiones, canales, caches)
+    for i in range(50):
+        started, future = await send(transport, pending, f"warmup-{i}")
+        await future
+
+    sequential = []
+    for i in range(MESSAGES):
+        started, future = await send(transport, pending, f"seq-{i}")
+        sequential.append(await future - started)
+
+    began = time.perf_counter()
+    sent = [await send(transport, pending, f"burst-{i}") for i in range(BURST)]
+    burst = [await future - started for started, future in sent]
+    elapsed = time.perf_counter() - began
+    return sequential, burst, BURST / elapsed
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def report(name, sequential, burst, throughput):
+    us = lambda s: s * 1_000_000
+    print(
+        f"{name:<12}{us(statistics.median(sequential)):>12.0f}{us(percentile(sequential, 0.99)):>12.0f}"
+        f"{us(statistics.median(burst)):>14.0f}{us(percentile(burst, 0.99)):>14.0f}{throughput:>12.0f}"
+    )
+
+
+async def main():
+    print(f"{'backend':<12}{'seq p50 µs':>12}{'seq p99 µs':>12}{'burst p50 µs':>14}{'burst p99 µs':>14}{'pedidos/s':>12}")
+
+    transport = InProcessTransport()
+    report("in-process", *await run(transport))
+    await transport.close()
+
+    transport = AmqpTransport()
+    try:
+        await asyncio.wait_for(transport.connect(), timeout=5)
+    except Exception as e:
+        print(f"{'amqp':<12}omitido: sin broker en {transport.url} ({e})")
+        return
+    try:
+        report("amqp", *await run(transport))
+    finally:
+        await transport.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
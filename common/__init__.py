@@ -0,0 +1 @@
+"""Código compartido entre los servicios de IntegraHub (workers y gateway)."""
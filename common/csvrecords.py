@@ -0,0 +1,76 @@
+"""Armado de registros CSV a partir de líneas, sin parsear los campos.
+
+Un campo entre comillas puede contener saltos de línea, así que una línea no siempre es un
+registro. Se sigue el estado de las comillas igual que el parser de csv/pandas: una comilla
+solo abre un campo si es su primer carácter; dentro de un campo sin comillas (`5" pulgadas`)
+es un carácter más. Contar comillas por línea unía con una sola comilla suelta el resto del
+archivo en un único "registro".
+
+Además se acota el tamaño de un registro (MAX_RECORD_BYTES): una comilla sin cerrar no puede
+hacer que se acumule en memoria todo lo que queda del archivo.
+"""
+import os
+
+MAX_RECORD_BYTES = int(os.getenv("CSV_MAX_RECORD_BYTES", str(1024 * 1024)))
+
+
+class CsvRecordTooLarge(ValueError):
+    """Un registro supera MAX_RECORD_BYTES (casi siempre, una comilla sin cerrar)."""
+
+
+def ends_inside_quotes(line: bytes, in_quotes: bool = False, delimiter: bytes = b",") -> bool:
+    """¿Queda abierto un campo entre comillas al final de `line`?
+
+    `in_quotes` indica si la línea empieza dentro de un campo entre comillas (continuación
+    de un registro); si no, la línea empieza un registro nuevo.
+    """
+    if not in_quotes and b'"' not in line:
+        return False  # caso común: ni comillas ni registro abierto
+
+    pos, n = 0, len(line)
+    while pos <= n:
+        if in_quotes:
+            i = line.find(b'"', pos)
+            if i < 0:
+                return True
+            if line[i + 1:i + 2] == b'"':
+                pos = i + 2  # "" dentro de comillas: comilla escapada
+                continue
+            in_quotes = False
+            # Tras cerrar las comillas, el resto del campo es literal hasta el delimitador
+            pos = line.find(delimiter, i + 1)
+            if pos < 0:
+                return False
+            pos += 1
+        elif line[pos:pos + 1] == b'"':
+            in_quotes = True
+            pos += 1
+        else:
+            pos = line.find(delimiter, pos)
+            if pos < 0:
+                return False
+            pos += 1
+    return in_quotes
+
+
+def read_record(readline, max_bytes: int = None) -> bytes:
+    """Lee un registro completo con `readline` (b"" al final del archivo)."""
+    max_bytes = max_bytes or MAX_RECORD_BYTES
+    record = readline()
+    if not ends_inside_quotes(record):
+        return record
+    parts = [record]
+    size = len(record)
+    while True:
+        more = readline()
+        if not more:
+            # Comillas sin cerrar al final del archivo: se devuelve tal cual y decide el parser
+            return b"".join(parts)
+        parts.append(more)
+        size += len(more)
+        if size > max_bytes:
+            raise CsvRecordTooLarge(
+                f"Registro CSV de más de {max_bytes} bytes (¿comillas sin cerrar?)"
+            )
+        if not ends_inside_quotes(more, in_quotes=True):
+            return b"".join(parts)
@@ -0,0 +1,13 @@
+import os
+import psycopg2
+
+# Configuración DB (la misma para todos los workers)
+DB_HOST = os.getenv("DB_HOST", "postgres")
+DB_USER = os.getenv("DB_USER", "admin")
+DB_PASS = os.getenv("DB_PASS", "secretpassword")
+DB_NAME = os.getenv("DB_NAME", "integrahub")
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+def get_db_connection():
+    return psycopg2.connect(host=DB_HOST, user=DB_USER, password=DB_PASS, dbname=DB_NAME,
+                            connect_timeout=DB_CONNECT_TIMEOUT)
@@ -0,0 +1,281 @@
+"""Diagnóstico opt-in para los servicios asyncio (gateway y workers).
+
+Se activa con INTEGRAHUB_DIAGNOSTICS=1 e incluye:
+  - Detector de bloqueos del event loop: un hilo vigía comprueba un latido que el loop
+    reprograma cada pocos ms. Si el latido se atrasa más de LOOP_STALL_THRESHOLD se
+    captura la pila del hilo del loop y el handler (primer frame de la aplicación).
+  - Profiler por muestreo: un hilo lee sys._current_frames() cada PROFILE_INTERVAL
+    segundos y acumula pilas en formato "folded" (compatible con flamegraph.pl y
+    speedscope). Se arranca/detiene con SIGUSR2 o desde /admin/profile en el gateway.
+
+Ninguno de los dos instrumenta el código: el costo es un callback del loop por latido
+y, solo mientras se perfila, una lectura de pilas por muestra.
+"""
+import asyncio
+import logging
+import os
+import signal
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from collections import Counter, deque
+
+logger = logging.getLogger("integrahub.diagnostics")
+
+DIAGNOSTICS_ENABLED = os.getenv("INTEGRAHUB_DIAGNOSTICS", "0") == "1"
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "0.1"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp")
+MAX_PROFILE_SECONDS = 300
+
+# Frames de la librería estándar y de paquetes instalados (no son "handlers" de la app)
+_LIBRARY_PATHS = tuple(
+    os.path.realpath(p) for p in {
+        sysconfig.get_paths()["stdlib"],
+        sysconfig.get_paths()["purelib"],
+        sysconfig.get_paths()["platlib"],
+    }
+)
+# Infraestructura compartida (transporte, arranque, este módulo): nunca es "el handler".
+# Sin esto, en single_node.py todo bloqueo se atribuía a _InProcessQueue._deliver.
+_COMMON_DIR = os.path.dirname(os.path.realpath(__file__)) + os.sep
+
+
+def _is_library(filename: str) -> bool:
+    path = os.path.realpath(filename)
+    return path.startswith(_LIBRARY_PATHS) or path.startswith(_COMMON_DIR) or filename.startswith("<")
+
+
+def _is_handle_run(frame) -> bool:
+    code = frame.f_code
+    return code.co_qualname == "Handle._run" and code.co_filename.endswith(os.path.join("asyncio", "events.py"))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _walk(frame):
+    """Frames de la pila, del más externo al más interno."""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    return list(reversed(frames))
+
+
+def handler_name(frame) -> str:
+    """Nombre del handler que retiene el loop: el primer frame de la aplicación dentro del
+    callback que está corriendo (lo que cuelga de events.Handle._run)."""
+    frames = _walk(frame)
+    # Lo anterior a Handle._run es quien arrancó el loop (asyncio.run desde main o un test)
+    for i in range(len(frames) - 1, -1, -1):
+        if _is_handle_run(frames[i]):
+            frames = frames[i + 1:] or frames
+            break
+    for candidate in frames:
+        if not _is_library(candidate.f_code.co_filename) and candidate.f_code.co_name != "<module>":
+            return _frame_label(candidate)
+    return _frame_label(frames[-1]) if frames else "?"
+
+
+class LoopStallDetector:
+    def __init__(self, loop, threshold=LOOP_STALL_THRESHOLD, max_reports=20):
+        self.loop = loop
+        self.threshold = threshold
+        self.stalls = 0
+        self.worst = 0.0
+        self.reports = deque(maxlen=max_reports)
+        self._loop_thread = None
+        self._last_beat = time.monotonic()
+        self._current = None     # reporte del bloqueo en curso
+        self._stop = threading.Event()
+        self._watchdog = None
+        self._timer = None
+
+    def start(self):
+        """Debe llamarse desde el hilo del event loop."""
+        self._loop_thread = threading.get_ident()
+        self._beat()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-stall-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.cancel()
+
+    def _beat(self):
+        now = time.monotonic()
+        if self._current is not None:
+            # El loop volvió: cerramos el reporte con la duración real del bloqueo
+            duration = now - self._last_beat
+            self._current["duration_ms"] = round(duration * 1000, 1)
+            self.worst = max(self.worst, duration)
+            logger.warning(
+                f" [🐢] Event loop liberado tras {duration * 1000:.0f} ms (handler: {self._current['handler']})"
+            )
+            self._current = None
+        self._last_beat = now
+        if not self._stop.is_set():
+            self._timer = self.loop.call_later(self.threshold / 4, self._beat)
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 4):
+            lag = time.monotonic() - self._last_beat
+            if lag < self.threshold or self._current is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            report = {
+                "handler": handler_name(frame),
+                "detected_at": time.time(),
+                "duration_ms": None,
+                "stack": "".join(traceback.format_stack(frame)),
+            }
+            self._current = report
+            self.stalls += 1
+            self.reports.append(report)
+            logger.warning(
+                f" [🐢] Event loop bloqueado > {self.threshold * 1000:.0f} ms por {report['handler']}\n{report['stack']}"
+            )
+
+    def stats(self) -> dict:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "stalls": self.stalls,
+            "worst_ms": round(self.worst * 1000, 1),
+            "recent": list(self.reports),
+        }
+
+
+class SamplingProfiler:
+    """Muestrea las pilas de todos los hilos y las acumula en formato folded."""
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self.started_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def pending(self) -> bool:
+        """Hay un perfil sin recoger: sigue muestreando o venció `max_seconds` y espera a stop()."""
+        return self.started_at is not None
+
+    def start(self, max_seconds=MAX_PROFILE_SECONDS):
+        if self.pending:
+            return
+        self.counts.clear()
+        self.samples = 0
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(max_seconds,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+        self.started_at = None
+        return self.folded()
+
+    def _run(self, max_seconds):
+        own = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                if names.get(thread_id) == "loop-stall-watchdog":
+                    continue
+                stack = ";".join(_frame_label(f) for f in _walk(frame))
+                self.counts[f"{names.get(thread_id, thread_id)};{stack}"] += 1
+            self.samples += 1
+        if not self._stop.is_set():
+            # Vencido: las muestras se conservan hasta el próximo stop() (SIGUSR2 o la API)
+            logger.warning(f" [🔬] Profiler detenido tras {max_seconds}s ({self.samples} muestras), pendiente de recoger")
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class Diagnostics:
+    def __init__(self, service: str, loop=None):
+        self.service = service
+        self.loop = loop or asyncio.get_running_loop()
+        self.stall_detector = LoopStallDetector(self.loop)
+        self.profiler = SamplingProfiler()
+
+    def start(self):
+        self.stall_detector.start()
+        try:
+            self.loop.add_signal_handler(signal.SIGUSR2, self.toggle_profiler)
+        except (NotImplementedError, RuntimeError, ValueError, AttributeError):
+            # Windows o un loop fuera del hilo principal: queda solo el control por API
+            pass
+        logger.warning(f" [🩺] Diagnóstico activo en {self.service} (umbral {self.stall_detector.threshold * 1000:.0f} ms)")
+
+    def stop(self):
+        self.stall_detector.stop()
+        if self.profiler.pending:
+            self.profiler.stop()
+
+    def start_profile(self, max_seconds=MAX_PROFILE_SECONDS):
+        self.profiler.start(max_seconds)
+        logger.warning(f" [🔬] Profiler iniciado en {self.service}")
+
+    def stop_profile(self):
+        """Detiene el profiler y guarda el resultado. Devuelve (ruta, contenido folded)."""
+        folded = self.profiler.stop()
+        path = os.path.join(PROFILE_DIR, f"profile-{self.service}-{os.getpid()}-{int(time.time())}.folded")
+        with open(path, "w") as f:
+            f.write(folded)
+        logger.warning(f" [🔬] Profiler detenido ({self.profiler.samples} muestras): {path}")
+        return path, folded
+
+    def toggle_profiler(self):
+        # Con el perfil vencido la señal lo recoge en lugar de empezar otro
+        if self.profiler.pending:
+            self.stop_profile()
+        else:
+            self.start_profile()
+
+
+_current = None
+
+
+def install(service: str):
+    """Activa el diagnóstico si INTEGRAHUB_DIAGNOSTICS=1. Llamar desde el event loop."""
+    global _current
+    if not DIAGNOSTICS_ENABLED:
+        return None
+    if _current is None:
+        _current = Diagnostics(service)
+        _current.start()
+    return _current
+
+
+def uninstall():
+    global _current
+    if _current is not None:
+        _current.stop()
+        _current = None
+
+
+def get_diagnostics():
+    return _current
@@ -0,0 +1,395 @@
+"""Esquema de la base de datos y migraciones versionadas.
+
+Todos los workers llaman a init_schema() al arrancar: las migraciones se aplican
+una sola vez (tabla schema_migrations) y bajo un advisory lock, así que no importa
+cuántos workers arranquen a la vez.
+"""
+import os
+from datetime import date
+
+from common.db import get_db_connection
+
+# Clave del pg_advisory_xact_lock que serializa las migraciones
+SCHEMA_LOCK_ID = 20260101
+# Particiones mensuales que se crean por adelantado
+ORDER_PARTITION_MONTHS_AHEAD = int(os.getenv("ORDER_PARTITION_MONTHS_AHEAD", "3"))
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def ensure_order_partitions(cur, months_ahead=ORDER_PARTITION_MONTHS_AHEAD, since=None):
+    """Crea las particiones mensuales de orders desde `since` (o el mes actual) hasta months_ahead.
+
+    Solo para tablas recién creadas (migración 0001, benchmarks): si orders_default ya tiene
+    filas de un mes, CREATE TABLE ... PARTITION OF falla. Para el mantenimiento normal usar
+    maintain_partitions(), que mueve esas filas.
+    """
+    month = _add_months(since or date.today(), 0)
+    last = _add_months(date.today(), months_ahead)
+    while month <= last:
+        upper = _add_months(month, 1)
+        cur.execute(
+            f"CREATE TABLE IF NOT EXISTS orders_p{month:%Y_%m} PARTITION OF orders "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        month = upper
+
+
+def create_order_partition(conn, month: date) -> bool:
+    """Crea la partición del mes (en su propia transacción). Devuelve True si la creó.
+
+    Si orders_default ya tiene filas de ese mes (p. ej. el inventory-service estuvo caído más
+    de ORDER_PARTITION_MONTHS_AHEAD meses) se crea la tabla suelta, se mueven las filas y
+    recién entonces se adjunta como partición.
+    """
+    upper = _add_months(month, 1)
+    name = f"orders_p{month:%Y_%m}"
+    bounds = f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT to_regclass(%s)", (name,))
+        if cur.fetchone()[0] is not None:
+            conn.rollback()
+            return False
+
+        # Bloqueamos escrituras en el default mientras se decide y se mueve
+        cur.execute("LOCK TABLE orders_default IN EXCLUSIVE MODE")
+        # Otro worker que arrancaba a la vez pudo crearla mientras esperábamos el lock
+        cur.execute("SELECT to_regclass(%s)", (name,))
+        if cur.fetchone()[0] is not None:
+            conn.rollback()
+            return False
+        cur.execute(
+            "SELECT EXISTS (SELECT 1 FROM orders_default WHERE created_at >= %s AND created_at < %s)",
+            (month, upper)
+        )
+        if not cur.fetchone()[0]:
+            cur.execute(f"CREATE TABLE {name} PARTITION OF orders {bounds}")
+        else:
+            # DELETE/INSERT directos sobre tablas hijas: no disparan los triggers de
+            # orders (order_keys y los rollups no cambian, el pedido sigue siendo el mismo)
+            cur.execute(f"CREATE TABLE {name} (LIKE orders INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+            cur.execute(f"""
+                WITH moved AS (
+                    DELETE FROM orders_default WHERE created_at >= %s AND created_at < %s RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """, (month, upper))
+            moved = cur.rowcount
+            cur.execute(f"ALTER TABLE orders ATTACH PARTITION {name} {bounds}")
+            print(f" [🗄️] {moved} pedidos movidos de orders_default a {name}")
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        # No impide el arranque: las filas siguen en orders_default y se reintenta luego
+        print(f" [!] No se pudo crear la partición {name}: {e}")
+        return False
+    finally:
+        cur.close()
+
+
+# --- MIGRACIONES ---
+# Cada migración recibe un cursor y corre dentro de la misma transacción que la registra.
+
+def _m0001_partitioned_orders(cur):
+    # La tabla original (sin particionar) se renombra para copiar sus filas
+    cur.execute("""
+        SELECT c.relkind FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = 'orders' AND n.nspname = current_schema()
+    """)
+    result = cur.fetchone()
+    legacy = result is not None and result[0] == 'r'
+    if legacy:
+        cur.execute("ALTER TABLE orders RENAME TO orders_unpartitioned")
+        cur.execute("ALTER SEQUENCE orders_id_seq OWNED BY NONE")
+
+    cur.execute("""
+        CREATE SEQUENCE IF NOT EXISTS orders_id_seq;
+        ALTER SEQUENCE orders_id_seq AS BIGINT;
+
+        CREATE TABLE orders (
+            id BIGINT NOT NULL DEFAULT nextval('orders_id_seq'),
+            order_id VARCHAR(50) NOT NULL,
+            customer_id VARCHAR(50),
+            status VARCHAR(20),
+            amount DECIMAL(10, 2),
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+
+        ALTER SEQUENCE orders_id_seq OWNED BY orders.id;
+        CREATE TABLE orders_default PARTITION OF orders DEFAULT;
+
+        -- Índices particionados: se propagan solos a cada partición nueva
+        CREATE INDEX orders_order_id_idx ON orders (order_id);
+        CREATE INDEX orders_customer_created_idx ON orders (customer_id, created_at);
+
+        -- Unicidad global de order_id (un índice único en la tabla particionada
+        -- tendría que incluir created_at). También sirve para podar particiones:
+        --   ... WHERE order_id = %s AND created_at = (SELECT created_at FROM order_keys WHERE order_id = %s)
+        CREATE TABLE order_keys (
+            order_id VARCHAR(50) PRIMARY KEY,
+            created_at TIMESTAMP NOT NULL
+        );
+
+        -- Un pedido repetido (reentrega del broker, CSV cargado dos veces) se descarta
+        CREATE FUNCTION orders_claim_key() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO order_keys (order_id, created_at) VALUES (NEW.order_id, NEW.created_at)
+            ON CONFLICT (order_id) DO NOTHING;
+            IF NOT FOUND THEN
+                RETURN NULL;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER orders_claim_key BEFORE INSERT ON orders
+            FOR EACH ROW EXECUTE FUNCTION orders_claim_key();
+    """)
+
+    since = None
+    if legacy:
+        cur.execute("SELECT min(created_at) FROM orders_unpartitioned")
+        oldest = cur.fetchone()[0]
+        since = oldest.date() if oldest else None
+    ensure_order_partitions(cur, since=since)
+
+    if legacy:
+        # Nos quedamos con la versión más reciente de cada order_id duplicado
+        cur.execute("""
+            INSERT INTO orders (id, order_id, customer_id, status, amount, created_at, updated_at)
+            SELECT DISTINCT ON (order_id)
+                id, order_id, customer_id, status, amount, COALESCE(created_at, NOW()), updated_at
+            FROM orders_unpartitioned
+            ORDER BY order_id, updated_at DESC NULLS LAST, id DESC;
+
+            SELECT setval('orders_id_seq', GREATEST((SELECT max(id) FROM orders), 1));
+            DROP TABLE orders_unpartitioned;
+        """)
+
+
+def _m0002_order_rollups(cur):
+    cur.execute("""
+        -- Rollups por hora y por día, por estado y cliente (customer_id NULL -> '')
+        CREATE TABLE orders_rollup_hourly (
+            bucket TIMESTAMP NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            customer_id VARCHAR(50) NOT NULL,
+            order_count BIGINT NOT NULL DEFAULT 0,
+            total_amount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (bucket, status, customer_id)
+        );
+
+        CREATE TABLE orders_rollup_daily (
+            bucket DATE NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            customer_id VARCHAR(50) NOT NULL,
+            order_count BIGINT NOT NULL DEFAULT 0,
+            total_amount DECIMAL(18, 2) NOT NULL DEFAULT 0,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (bucket, status, customer_id)
+        );
+
+        -- Un cambio en orders expresado como deltas (+1/-1 pedido, +/- monto)
+        CREATE TYPE orders_rollup_delta AS (
+            created_at TIMESTAMP,
+            status VARCHAR(20),
+            customer_id VARCHAR(50),
+            n INT,
+            amount DECIMAL(10, 2)
+        );
+
+        CREATE FUNCTION orders_rollup_merge(deltas orders_rollup_delta[]) RETURNS void AS $$
+            INSERT INTO orders_rollup_hourly AS r (bucket, status, customer_id, order_count, total_amount, last_updated)
+            SELECT date_trunc('hour', d.created_at), COALESCE(d.status, ''), COALESCE(d.customer_id, ''),
+                   sum(d.n), COALESCE(sum(d.amount), 0), NOW()
+            FROM unnest(deltas) d
+            GROUP BY 1, 2, 3
+            HAVING sum(d.n) <> 0 OR COALESCE(sum(d.amount), 0) <> 0
+            ON CONFLICT (bucket, status, customer_id) DO UPDATE SET
+                order_count = r.order_count + EXCLUDED.order_count,
+                total_amount = r.total_amount + EXCLUDED.total_amount,
+                last_updated = NOW();
+
+            INSERT INTO orders_rollup_daily AS r (bucket, status, customer_id, order_count, total_amount, last_updated)
+            SELECT d.created_at::date, COALESCE(d.status, ''), COALESCE(d.customer_id, ''),
+                   sum(d.n), COALESCE(sum(d.amount), 0), NOW()
+            FROM unnest(deltas) d
+            GROUP BY 1, 2, 3
+            HAVING sum(d.n) <> 0 OR COALESCE(sum(d.amount), 0) <> 0
+            ON CONFLICT (bucket, status, customer_id) DO UPDATE SET
+                order_count = r.order_count + EXCLUDED.order_count,
+                total_amount = r.total_amount + EXCLUDED.total_amount,
+                last_updated = NOW();
+        $$ LANGUAGE sql;
+
+        -- Triggers por sentencia: una carga masiva de N filas hace un solo merge agregado
+        CREATE FUNCTION orders_rollup_refresh() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM orders_rollup_merge(ARRAY(
+                    SELECT ROW(created_at, status, customer_id, 1, amount)::orders_rollup_delta FROM new_rows));
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM orders_rollup_merge(ARRAY(
+                    SELECT ROW(created_at, status, customer_id, 1, amount)::orders_rollup_delta FROM new_rows
+                    UNION ALL
+                    SELECT ROW(created_at, status, customer_id, -1, -amount)::orders_rollup_delta FROM old_rows));
+            ELSE
+                PERFORM orders_rollup_merge(ARRAY(
+                    SELECT ROW(created_at, status, customer_id, -1, -amount)::orders_rollup_delta FROM old_rows));
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER orders_rollup_insert AFTER INSERT ON orders
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION orders_rollup_refresh();
+        CREATE TRIGGER orders_rollup_update AFTER UPDATE ON orders
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION orders_rollup_refresh();
+        CREATE TRIGGER orders_rollup_delete AFTER DELETE ON orders
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION orders_rollup_refresh();
+
+        -- Backfill con los pedidos que ya existían
+        INSERT INTO orders_rollup_hourly (bucket, status, customer_id, order_count, total_amount)
+        SELECT date_trunc('hour', created_at), COALESCE(status, ''), COALESCE(customer_id, ''),
+               count(*), COALESCE(sum(amount), 0)
+        FROM orders GROUP BY 1, 2, 3;
+
+        INSERT INTO orders_rollup_daily (bucket, status, customer_id, order_count, total_amount)
+        SELECT created_at::date, COALESCE(status, ''), COALESCE(customer_id, ''),
+               count(*), COALESCE(sum(amount), 0)
+        FROM orders GROUP BY 1, 2, 3;
+
+        -- analytics_daily pasa a ser una vista sobre el rollup (ya no se actualiza a mano)
+        DROP TABLE IF EXISTS analytics_daily;
+        CREATE VIEW analytics_daily AS
+            SELECT bucket AS date,
+                   sum(order_count)::INT AS total_orders,
+                   sum(total_amount) AS total_revenue,
+                   max(last_updated) AS last_updated
+            FROM orders_rollup_daily
+            WHERE status = 'CONFIRMED'
+            GROUP BY bucket;
+    """)
+
+
+def _m0003_import_checkpoints(cur):
+    # Checkpoints de la carga legacy (antes los creaba el legacy-service)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS legacy_import_checkpoints (
+            file_key VARCHAR(512) PRIMARY KEY,
+            position BIGINT NOT NULL DEFAULT 0,
+            rows_imported BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+
+def _m0004_import_staging(cur):
+    # Las importaciones por API se cargan en staging y pasan a orders de una sola vez
+    # al recibir ImportCompleted: una subida que falla a mitad no deja pedidos sueltos.
+    cur.execute("""
+        ALTER TABLE legacy_import_checkpoints
+            ADD COLUMN IF NOT EXISTS rows_rejected BIGINT NOT NULL DEFAULT 0;
+
+        CREATE TABLE legacy_import_staging (
+            import_key VARCHAR(512) NOT NULL,
+            seq INT NOT NULL,
+            order_id VARCHAR(50) NOT NULL,
+            customer_id VARCHAR(50),
+            amount DECIMAL(10, 2)
+        );
+        CREATE INDEX legacy_import_staging_key_idx ON legacy_import_staging (import_key, seq);
+    """)
+
+
+def _m0005_import_results(cur):
+    # Resultado de cada importación por API (LOADED o ABORTED). Es lo que marca que terminó:
+    # una reentrega de ImportCompleted reenvía el mismo resultado en lugar de adivinarlo por
+    # la falta de checkpoint, y un lote que llega tarde no vuelve a staging.
+    cur.execute("""
+        CREATE TABLE legacy_import_results (
+            import_key VARCHAR(512) PRIMARY KEY,
+            status VARCHAR(20) NOT NULL,
+            rows_loaded BIGINT NOT NULL DEFAULT 0,
+            rows_duplicated BIGINT NOT NULL DEFAULT 0,
+            rows_rejected BIGINT NOT NULL DEFAULT 0,
+            error TEXT,
+            finished_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX legacy_import_results_finished_idx ON legacy_import_results (finished_at);
+    """)
+
+
+MIGRATIONS = [
+    (1, "orders particionada por mes + order_keys", _m0001_partitioned_orders),
+    (2, "rollups horarios/diarios de orders", _m0002_order_rollups),
+    (3, "checkpoints de importación legacy", _m0003_import_checkpoints),
+    (4, "staging de importaciones por API", _m0004_import_staging),
+    (5, "resultado de importaciones por API", _m0005_import_results),
+]
+
+
+def apply_migrations(conn):
+    """Aplica las migraciones pendientes. Idempotente."""
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    applied = {row[0] for row in cur.fetchall()}
+
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        migrate(cur)
+        cur.execute(
+            "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+            (version, description)
+        )
+        print(f" [🗄️] Migración {version:04d} aplicada: {description}")
+
+    conn.commit()
+    cur.close()
+
+
+def ensure_future_partitions(conn, months_ahead=ORDER_PARTITION_MONTHS_AHEAD):
+    """Particiones del mes actual y los próximos months_ahead, una transacción por mes."""
+    month = _add_months(date.today(), 0)
+    for i in range(months_ahead + 1):
+        create_order_partition(conn, _add_months(month, i))
+
+
+def init_schema():
+    conn = get_db_connection()
+    try:
+        apply_migrations(conn)
+        # Fuera de la transacción de migraciones: un mes problemático no aborta el arranque
+        ensure_future_partitions(conn)
+    finally:
+        conn.close()
+
+
+def maintain_partitions():
+    """Para tareas periódicas: crea las particiones de los próximos meses."""
+    conn = get_db_connection()
+    try:
+        ensure_future_partitions(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,95 @@
+"""Arranque común de los workers: esperar dependencias, preparar el esquema y avisar cuándo estamos listos.
+
+En lugar de un time.sleep fijo, cada dependencia se sondea con backoff exponencial
+(con jitter) hasta que responde o se agota STARTUP_TIMEOUT. Postgres y RabbitMQ se
+esperan en paralelo.
+"""
+import asyncio
+import os
+import random
+import time
+
+from common.transport import AmqpTransport
+
+STARTUP_TIMEOUT = float(os.getenv("STARTUP_TIMEOUT", "120"))
+BACKOFF_INITIAL = 0.1
+BACKOFF_MAX = 5.0
+# Si se define, se escribe aquí el tiempo de arranque al quedar listo (healthchecks, benchmarks)
+READY_FILE = os.getenv("READY_FILE")
+
+# Inicio del arranque (lo fija start_worker, lo usa mark_ready)
+_started = None
+
+
+async def retry_until_ready(name, probe, timeout=STARTUP_TIMEOUT, retry_on=Exception):
+    """Ejecuta `probe` (corrutina) hasta que no falle. Devuelve su resultado.
+
+    Solo se reintentan las excepciones de `retry_on`; cualquier otra se propaga enseguida.
+    """
+    deadline = time.monotonic() + timeout
+    delay = BACKOFF_INITIAL
+    attempt = 1
+    while True:
+        try:
+            return await probe()
+        except retry_on as e:
+            if time.monotonic() + delay > deadline:
+                raise RuntimeError(f"{name} no disponible tras {timeout:.0f}s: {e}") from e
+            print(f" [⏳] Esperando a {name} (intento {attempt}, reintento en {delay:.1f}s)... ({e})")
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(BACKOFF_MAX, delay * 2)
+            attempt += 1
+
+
+def _init_database():
+    # Import diferido: psycopg2 solo se carga en los workers que usan Postgres
+    from common.schema import init_schema
+    init_schema()
+
+
+async def wait_for_postgres():
+    import psycopg2
+    # La primera conexión exitosa también aplica las migraciones (una sola vez y
+    # bajo advisory lock, ver common/schema.py): no hace falta otra ida y vuelta.
+    # Solo se reintenta si Postgres no responde: un error de SQL en una migración
+    # no se arregla esperando y debe tumbar el worker de inmediato.
+    await retry_until_ready(
+        "Postgres", lambda: asyncio.to_thread(_init_database), retry_on=psycopg2.OperationalError
+    )
+
+
+async def wait_for_rabbitmq():
+    transport = AmqpTransport()
+    await retry_until_ready("RabbitMQ", transport.connect)
+    return transport
+
+
+async def start_worker(name, postgres=True, rabbitmq=True):
+    """Espera a las dependencias del worker y devuelve su transporte de eventos AMQP (o None).
+
+    El worker todavía no está listo: debe llamar a mark_ready() después de declarar sus colas.
+    """
+    global _started
+    _started = time.perf_counter()
+    if READY_FILE and os.path.exists(READY_FILE):
+        os.remove(READY_FILE)  # de un arranque anterior del mismo contenedor
+
+    waits = []
+    if postgres:
+        waits.append(wait_for_postgres())
+    if rabbitmq:
+        waits.append(wait_for_rabbitmq())
+    results = await asyncio.gather(*waits)
+    transport = results[-1] if rabbitmq else None
+
+    print(f" [🔌] {name}: dependencias listas en {time.perf_counter() - _started:.2f}s")
+    return transport
+
+
+def mark_ready(name):
+    """Reporta el worker como listo (log y READY_FILE). Llamar con las colas ya declaradas."""
+    elapsed = time.perf_counter() - _started if _started is not None else 0.0
+    print(f" [⏱️] {name} listo en {elapsed:.2f}s")
+    if READY_FILE:
+        with open(READY_FILE, "w") as f:
+            f.write(f"{elapsed:.6f}\n")
@@ -0,0 +1,278 @@
+"""Transporte de eventos intercambiable: RabbitMQ (AMQP) o en memoria (mismo proceso).
+
+Ambos backends ofrecen lo mismo:
+  - publish(event, routing_key): el evento se serializa a JSON en los dos casos.
+  - subscribe(queue, patterns, handler, ...): una cola con nombre recibe los eventos cuyo
+    routing key coincide con algún patrón (semántica topic de AMQP: `*` = una palabra,
+    `#` = cero o más). Varias colas reciben copias; dentro de una cola se reparte.
+  - ack/nack: el handler recibe un mensaje con `.body`, `.routing_key` y `process()`,
+    igual que aio_pika.IncomingMessage. Si el handler lanza una excepción dentro de
+    `process()` el mensaje se rechaza y va a la cola de muertos (`dead_letter`).
+
+AmqpTransport es lo que usan los contenedores. InProcessTransport permite correr el
+gateway y los workers en un solo proceso (single_node.py) y probar el flujo sin broker.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+
+import aio_pika
+
+logger = logging.getLogger("integrahub.transport")
+
+EXCHANGE = "integrahub.events"
+DLX_EXCHANGE = "dlx.events"
+# Mensajes muertos que se conservan por cola en el backend en memoria
+MAX_DEAD_LETTERS = 10_000
+
+
+def rabbitmq_url():
+    rmq_host = os.getenv("RABBITMQ_HOST", "rabbitmq")
+    rmq_user = os.getenv("RABBITMQ_DEFAULT_USER", "user")
+    rmq_pass = os.getenv("RABBITMQ_DEFAULT_PASS", "password")
+    return f"amqp://{rmq_user}:{rmq_pass}@{rmq_host}/"
+
+
+def topic_matches(pattern: str, routing_key: str) -> bool:
+    """Coincidencia topic de AMQP: `*` es exactamente una palabra y `#` cero o más."""
+    words = routing_key.split(".")
+    parts = pattern.split(".")
+
+    def match(i, j):
+        while i < len(parts):
+            part = parts[i]
+            if part == "#":
+                # `#` al final se come todo lo que quede
+                if i == len(parts) - 1:
+                    return True
+                return any(match(i + 1, k) for k in range(j, len(words) + 1))
+            if j == len(words) or (part != "*" and part != words[j]):
+                return False
+            i += 1
+            j += 1
+        return j == len(words)
+
+    return match(0, 0)
+
+
+class Transport:
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def publish(self, event: dict, routing_key: str):
+        raise NotImplementedError
+
+    async def subscribe(self, queue: str, patterns, handler, dead_letter=None, prefetch=None, durable=True):
+        """`dead_letter`: routing key de muertos (la cola de muertos se llama `<queue>_dlq`).
+        `prefetch`: mensajes en proceso a la vez (1 = en orden)."""
+        raise NotImplementedError
+
+    async def queue_depth(self, queue: str) -> int:
+        """Mensajes pendientes en la cola (0 si todavía no existe). En AMQP son los "ready":
+        lo entregado y sin confirmar no cuenta, por eso el prefetch del consumidor importa."""
+        raise NotImplementedError
+
+
+# --- BACKEND AMQP (RabbitMQ) ---
+
+class AmqpTransport(Transport):
+    def __init__(self, url=None):
+        self.url = url or rabbitmq_url()
+        self.connection = None
+        self._exchange = None
+
+    async def connect(self):
+        # connect_robust reconecta solo si Rabbit se cae momentáneamente
+        self.connection = await aio_pika.connect_robust(self.url)
+        channel = await self.connection.channel()
+        self._exchange = await channel.declare_exchange(EXCHANGE, aio_pika.ExchangeType.TOPIC)
+
+    async def close(self):
+        if self.connection is not None and not self.connection.is_closed:
+            await self.connection.close()
+        self.connection = None
+        self._exchange = None
+
+    async def publish(self, event: dict, routing_key: str):
+        if self._exchange is None or self.connection.is_closed:
+            await self.connect()
+        await self._exchange.publish(
+            aio_pika.Message(body=json.dumps(event).encode(), content_type="application/json"),
+            routing_key=routing_key
+        )
+
+    async def subscribe(self, queue, patterns, handler, dead_letter=None, prefetch=None, durable=True):
+        # Un canal por suscripción: el prefetch (QoS) es por canal
+        channel = await self.connection.channel()
+        if prefetch:
+            await channel.set_qos(prefetch_count=prefetch)
+
+        args = None
+        if dead_letter:
+            dlx_exchange = await channel.declare_exchange(DLX_EXCHANGE, aio_pika.ExchangeType.DIRECT)
+            dlq_queue = await channel.declare_queue(f"{queue}_dlq", durable=durable, auto_delete=not durable)
+            await dlq_queue.bind(dlx_exchange, routing_key=dead_letter)
+            args = {
+                "x-dead-letter-exchange": DLX_EXCHANGE,
+                "x-dead-letter-routing-key": dead_letter
+            }
+
+        exchange = await channel.declare_exchange(EXCHANGE, aio_pika.ExchangeType.TOPIC)
+        amqp_queue = await channel.declare_queue(queue, durable=durable, auto_delete=not durable, arguments=args)
+        for pattern in patterns:
+            await amqp_queue.bind(exchange, routing_key=pattern)
+        await amqp_queue.consume(handler)
+
+    async def queue_depth(self, queue):
+        if self.connection is None:
+            await self.connect()
+        # Canal nuevo por consulta: si la cola no existe el broker cierra el canal
+        channel = await self.connection.channel()
+        try:
+            amqp_queue = await channel.declare_queue(queue, passive=True)
+            return amqp_queue.declaration_result.message_count
+        except aio_pika.exceptions.ChannelClosed:
+            # La cola aún no fue declarada por el worker: nada pendiente
+            return 0
+        finally:
+            if not channel.is_closed:
+                await channel.close()
+
+
+# --- BACKEND EN MEMORIA (un solo proceso) ---
+
+class InProcessMessage:
+    """Misma interfaz que usan los handlers de aio_pika.IncomingMessage."""
+
+    def __init__(self, body: bytes, routing_key: str, queue, redelivered=False):
+        self.body = body
+        self.routing_key = routing_key
+        self.redelivered = redelivered
+        self.processed = False
+        self._queue = queue
+
+    async def ack(self):
+        self.processed = True
+
+    async def nack(self, requeue=True):
+        self.processed = True
+        if requeue:
+            self._queue.put(InProcessMessage(self.body, self.routing_key, self._queue, redelivered=True))
+        else:
+            self._queue.dead_letter(self)
+
+    async def reject(self, requeue=False):
+        await self.nack(requeue=requeue)
+
+    @asynccontextmanager
+    async def process(self, requeue=False):
+        try:
+            yield self
+        except Exception:
+            if not self.processed:
+                await self.nack(requeue=requeue)
+            raise
+        else:
+            if not self.processed:
+                await self.ack()
+
+
+class _InProcessQueue:
+    def __init__(self, transport, name, patterns, handler, dead_letter, prefetch):
+        self.transport = transport
+        self.name = name
+        self.patterns = tuple(patterns)
+        self.handler = handler
+        self.dead_letter_key = dead_letter
+        self.pending = asyncio.Queue()
+        # Sin prefetch, como en aio_pika sin QoS: todo lo que llega se procesa en paralelo
+        self.slots = asyncio.Semaphore(prefetch) if prefetch else None
+        self.in_flight = set()
+        self.consumer = asyncio.create_task(self._consume(), name=f"consumer:{name}")
+
+    def put(self, message):
+        self.pending.put_nowait(message)
+
+    def dead_letter(self, message):
+        if self.dead_letter_key is None:
+            logger.warning(f" [x] Mensaje descartado en {self.name} ({message.routing_key}), sin cola de muertos")
+            return
+        dlq = self.transport.dead_letters.setdefault(f"{self.name}_dlq", deque(maxlen=MAX_DEAD_LETTERS))
+        dlq.append(message)
+        logger.warning(f" [☠️] Mensaje {message.routing_key} de {self.name} enviado a {self.name}_dlq")
+
+    async def _consume(self):
+        while True:
+            # Primero el hueco y luego el mensaje: como con QoS en el broker, lo que no
+            # cabe en el prefetch sigue en la cola y cuenta en queue_depth
+            if self.slots is not None:
+                await self.slots.acquire()
+            message = await self.pending.get()
+            task = asyncio.create_task(self._deliver(message))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+
+    async def _deliver(self, message):
+        try:
+            await self.handler(message)
+        except Exception as e:
+            logger.error(f" [!] Error en el handler de {self.name}: {e}")
+            if not message.processed:
+                await message.nack(requeue=False)
+        else:
+            # Sin broker no hay reentrega por desconexión: lo no confirmado se da por confirmado
+            if not message.processed:
+                await message.ack()
+        finally:
+            if self.slots is not None:
+                self.slots.release()
+
+    async def join(self):
+        while self.pending.qsize() or self.in_flight:
+            await asyncio.sleep(0)
+            if self.in_flight:
+                await asyncio.wait(set(self.in_flight))
+
+
+class InProcessTransport(Transport):
+    """Enrutamiento topic en memoria sobre asyncio. Los mensajes no sobreviven al proceso."""
+
+    def __init__(self):
+        self.queues = {}
+        self.dead_letters = {}
+
+    async def close(self):
+        for queue in self.queues.values():
+            queue.consumer.cancel()
+            for task in list(queue.in_flight):
+                task.cancel()
+        self.queues.clear()
+
+    async def publish(self, event: dict, routing_key: str):
+        # Se serializa igual que en AMQP: cada cola recibe su copia y los handlers no cambian
+        body = json.dumps(event).encode()
+        for queue in self.queues.values():
+            if any(topic_matches(p, routing_key) for p in queue.patterns):
+                queue.put(InProcessMessage(body, routing_key, queue))
+
+    async def subscribe(self, queue, patterns, handler, dead_letter=None, prefetch=None, durable=True):
+        if queue in self.queues:
+            raise ValueError(f"La cola {queue} ya tiene un consumidor")
+        self.queues[queue] = _InProcessQueue(self, queue, patterns, handler, dead_letter, prefetch)
+
+    async def queue_depth(self, queue):
+        q = self.queues.get(queue)
+        # Lo que está en proceso también es backlog: sin prefetch todo pasa directo a in_flight
+        return q.pending.qsize() + len(q.in_flight) if q else 0
+
+    async def join(self):
+        """Espera a que todas las colas queden vacías (incluye lo que publiquen los handlers)."""
+        while any(q.pending.qsize() or q.in_flight for q in self.queues.values()):
+            for q in list(self.queues.values()):
+                await q.join()
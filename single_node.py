@@ -0,0 +1,70 @@
+"""IntegraHub en un solo proceso (instalaciones edge de una sola máquina).
+
+Corre el API Gateway y los handlers de inventory, notification y analytics (más las
+importaciones por API del legacy-service) sobre un InProcessTransport: los eventos
+viajan por colas asyncio con el mismo enrutamiento topic que en RabbitMQ
+(order.created, order.# y order.confirmed), sin broker de por medio.
+
+Solo necesita Postgres. El watcher de la carpeta /inbox sigue siendo su propio servicio.
+
+Uso (desde la raíz del repo, con las dependencias del gateway y de los workers):
+    DB_HOST=localhost python single_node.py
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+import uvicorn
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT / "api-gateway"))
+sys.path.insert(0, str(ROOT))
+
+from common import diagnostics
+from common.startup import mark_ready, start_worker
+from common.transport import InProcessTransport
+
+HOST = os.getenv("SINGLE_NODE_HOST", "0.0.0.0")
+PORT = int(os.getenv("SINGLE_NODE_PORT", "8000"))
+
+# Los workers viven en carpetas con guion (no son paquetes): se cargan por ruta
+WORKERS = ["inventory-service", "notification-service", "analytics-service", "legacy-service"]
+
+
+def load_worker(name):
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), ROOT / "workers" / name / "worker.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def main():
+    diagnostics.install("single-node")
+    transport = InProcessTransport()
+
+    # Postgres con backoff y migraciones, igual que los workers; sin RabbitMQ
+    await start_worker("IntegraHub single-node", rabbitmq=False)
+
+    # Los consumidores se suscriben antes de aceptar pedidos: en memoria no hay
+    # colas durables que guarden lo publicado sin suscriptores
+    workers = {name: load_worker(name) for name in WORKERS}
+    await workers["inventory-service"].setup(transport)
+    await workers["notification-service"].setup(transport)
+    await workers["analytics-service"].setup(transport)
+    await workers["legacy-service"].consume_imports(transport)
+    mark_ready("IntegraHub single-node")
+    partitions_task = asyncio.create_task(workers["inventory-service"].maintain_partitions_periodically())
+
+    from core.rabbitmq import set_transport
+    from main import app
+    set_transport(transport)
+
+    print(f" [*] IntegraHub single-node escuchando en http://{HOST}:{PORT} (transporte en memoria)")
+    server = uvicorn.Server(uvicorn.Config(app, host=HOST, port=PORT))
+    await server.serve()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
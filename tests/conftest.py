@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+# common/ (código compartido entre gateway y workers) vive en la raíz del repo
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import pytest
+
+
+@pytest.fixture
+def db():
+    """Conexión a Postgres (DB_HOST, DB_USER...) con el esquema aplicado; se omite si no hay base."""
+    import psycopg2
+    from common.db import get_db_connection
+    from common.schema import init_schema
+
+    try:
+        init_schema()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Postgres no disponible: {e}")
+    conn = get_db_connection()
+    yield conn
+    conn.close()
+
+
+def load_worker(name):
+    """Los workers viven en carpetas con guion: se cargan por ruta."""
+    import importlib.util
+    spec = importlib.util.spec_from_file_location(
+        name.replace("-", "_"), ROOT / "workers" / name / "worker.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
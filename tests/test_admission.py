@@ -0,0 +1,167 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "api-gateway"))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from core.admission import RateLimiter, QueueDepthMonitor
+
+ORDER = {'customer_id': 'CUST-1', 'items': [{'product_id': 'P1', 'quantity': 1}]}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2, burst=2, clock=clock)
+
+    assert limiter.check('a') == 0
+    assert limiter.check('a') == 0
+    assert limiter.check('a') == pytest.approx(0.5)
+    # Otro cliente tiene su propio bucket
+    assert limiter.check('b') == 0
+
+    clock.now = 0.5
+    assert limiter.check('a') == 0
+
+
+def test_rate_limiter_evicts_idle_clients():
+    limiter = RateLimiter(rate=1, burst=1, max_clients=2, clock=FakeClock())
+    for key in ('a', 'b', 'c'):
+        limiter.check(key)
+    assert list(limiter.buckets) == ['b', 'c']
+
+
+def test_queue_monitor_hysteresis():
+    monitor = QueueDepthMonitor('q', high=100, low=50, interval=1)
+    monitor.update(120, now=0)
+    assert monitor.overloaded
+    monitor.update(80, now=1)
+    assert monitor.overloaded
+    # Se vacían 40 msg/s: faltan 30 para bajar de `low`
+    assert monitor.retry_after() == 1
+    monitor.update(40, now=2)
+    assert not monitor.overloaded
+
+
+def test_queue_monitor_marks_follow_target_wait():
+    monitor = QueueDepthMonitor('q', high=1200, low=960, interval=1, target_wait=30, min_high=100)
+    # Sin medición: los umbrales estáticos
+    monitor.update(0, now=0)
+    monitor.update(500, now=1)
+    assert (monitor.high, monitor.low) == (1200, 960)
+    assert monitor.drain_rate is None
+
+    # Con backlog en ambas muestras: entraron 100 y la cola bajó 100 -> se consumen 200/s
+    monitor.note_published(100)
+    monitor.update(400, now=2)
+    assert monitor.drain_rate == pytest.approx(200)
+    assert (monitor.high, monitor.low) == (6000, 4800)
+
+    # Un worker lento baja el umbral (30 s a 2/s), con piso en min_high
+    slow = QueueDepthMonitor('q', high=1200, low=960, interval=1, target_wait=30, min_high=100)
+    slow.update(900, now=0)
+    slow.update(898, now=1)
+    assert (slow.high, slow.low) == (100, 80)
+    assert slow.overloaded
+    # Cola vacía: el consumo no se mide (el worker no está saturado)
+    slow.update(0, now=2)
+    assert slow.drain_rate == pytest.approx(2)
+
+
+@pytest.fixture
+def orders_module(monkeypatch):
+    import routers.orders as orders_module
+
+    async def fake_publish(event, rk):
+        return True
+
+    monkeypatch.setattr(orders_module, 'publish_event', fake_publish)
+    return orders_module
+
+
+def test_create_order_rate_limited(monkeypatch, orders_module):
+    import core.admission as admission
+    monkeypatch.setattr(admission, 'limiter', RateLimiter(rate=0.1, burst=1))
+
+    client = TestClient(app)
+    assert client.post('/orders', json=ORDER).status_code == 202
+
+    resp = client.post('/orders', json=ORDER)
+    assert resp.status_code == 429
+    assert int(resp.headers['Retry-After']) >= 1
+
+
+def test_create_order_rejected_when_queue_overloaded(monkeypatch, orders_module):
+    import core.admission as admission
+    monitor = QueueDepthMonitor('q_inventory', high=10, low=5, interval=60)
+    monitor.update(50)
+    monkeypatch.setattr(admission, 'queue_monitor', monitor)
+
+    client = TestClient(app)
+    resp = client.post('/orders', json=ORDER)
+    assert resp.status_code == 503
+    assert 'Retry-After' in resp.headers
+
+
+def test_published_orders_feed_the_monitor(monkeypatch, orders_module):
+    import core.admission as admission
+    monitor = QueueDepthMonitor('q_inventory', high=10, low=5, interval=60)
+    monkeypatch.setattr(admission, 'queue_monitor', monitor)
+
+    client = TestClient(app)
+    assert client.post('/orders', json=ORDER).status_code == 202
+    assert monitor._published == 1
+
+
+def test_queue_monitor_sees_backlog_behind_bounded_prefetch(monkeypatch):
+    """Con prefetch acotado el backlog queda en la cola (ready) y el monitor lo ve."""
+    import asyncio
+    import core.admission as admission
+    from common.transport import InProcessTransport
+    from conftest import load_worker
+
+    inventory = load_worker('inventory-service')
+    monkeypatch.setattr(inventory, 'INVENTORY_PREFETCH', 3)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def stuck_order(message):
+            async with message.process():
+                await release.wait()
+
+        monkeypatch.setattr(inventory, 'process_order', stuck_order)
+        transport = InProcessTransport()
+        await inventory.setup(transport)
+
+        async def fake_get_transport():
+            return transport
+
+        monkeypatch.setattr(admission, 'get_transport', fake_get_transport)
+        monitor = QueueDepthMonitor('q_inventory', high=10, low=5, interval=0.01)
+
+        for i in range(15):
+            await transport.publish({'data': {'order_id': str(i)}}, 'order.created')
+        task = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        release.set()
+        await transport.join()
+        await transport.close()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+    # En memoria cuentan los 12 en espera y los 3 en proceso
+    assert monitor.depth == 15
+    assert monitor.overloaded
@@ -0,0 +1,35 @@
+import io
+
+import pytest
+
+from common import csvrecords
+from common.csvrecords import CsvRecordTooLarge, ends_inside_quotes, read_record
+
+
+@pytest.mark.parametrize('line, in_quotes, expected', [
+    (b'L-1,C1,10\n', False, False),
+    (b'L-1,"Cliente\n', False, True),
+    (b'con salto",20\n', True, False),
+    (b'L-4,"Otro, ""raro""",40\n', False, False),
+    (b'L-4,"abre ""y sigue\n', False, True),
+    # Comilla en medio de un campo sin comillas: es un carácter más, no abre nada
+    (b'L-5,Tienda 5" pulgadas,50\n', False, False),
+    (b'L-5,"Tienda"x,50\n', False, False),
+    (b'L-6,C6,"\n', False, True),
+    (b'sigue "" escapada\n', True, True),
+])
+def test_ends_inside_quotes(line, in_quotes, expected):
+    assert ends_inside_quotes(line, in_quotes) is expected
+
+
+def test_read_record_joins_quoted_newlines_only():
+    stream = io.BytesIO(b'a,"x\ny",1\nb,5" pulgadas,2\nc,z,3\n')
+    records = list(iter(lambda: read_record(stream.readline), b''))
+    assert records == [b'a,"x\ny",1\n', b'b,5" pulgadas,2\n', b'c,z,3\n']
+
+
+def test_read_record_bounds_unclosed_quotes(monkeypatch):
+    monkeypatch.setattr(csvrecords, 'MAX_RECORD_BYTES', 100)
+    stream = io.BytesIO(b'a,"sin cerrar,1\n' + b'b,c,2\n' * 100)
+    with pytest.raises(CsvRecordTooLarge):
+        read_record(stream.readline)
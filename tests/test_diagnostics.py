@@ -0,0 +1,149 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "api-gateway"))
+
+from fastapi.testclient import TestClient
+
+from main import app
+from common import diagnostics
+from common.diagnostics import Diagnostics, LoopStallDetector, SamplingProfiler
+
+
+def blocking_handler():
+    time.sleep(0.3)
+
+
+def test_stall_detector_reports_blocking_handler():
+    async def scenario():
+        detector = LoopStallDetector(asyncio.get_running_loop(), threshold=0.05)
+        detector.start()
+        await asyncio.sleep(0.1)
+        blocking_handler()
+        await asyncio.sleep(0.1)
+        detector.stop()
+        return detector.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['stalls'] == 1
+    report = stats['recent'][0]
+    # La corrutina que corre el loop, no el test que llamó a asyncio.run
+    assert report['handler'].startswith('test_stall_detector_reports_blocking_handler.<locals>.scenario')
+    assert 'blocking_handler' in report['stack']
+    assert report['duration_ms'] >= 250
+
+
+async def blocking_order_handler(message):
+    async with message.process():
+        blocking_handler()
+
+
+def test_stall_through_in_process_transport_names_the_handler():
+    from common.transport import InProcessTransport
+
+    async def scenario():
+        detector = LoopStallDetector(asyncio.get_running_loop(), threshold=0.05)
+        detector.start()
+        transport = InProcessTransport()
+        await transport.subscribe('q_inventory', ['order.created'], blocking_order_handler)
+        await transport.publish({'data': {'order_id': 'X'}}, 'order.created')
+        await transport.join()
+        await asyncio.sleep(0.1)
+        await transport.close()
+        detector.stop()
+        return detector.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['stalls'] == 1
+    report = stats['recent'][0]
+    # El handler suscrito, no _InProcessQueue._deliver (transport.py)
+    assert report['handler'].startswith('blocking_order_handler (test_diagnostics.py:')
+    assert '_deliver' in report['stack']
+
+
+def test_profiler_folded_output():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    deadline = time.monotonic() + 0.2
+    while time.monotonic() < deadline:
+        sum(range(1000))
+    folded = profiler.stop()
+
+    assert profiler.samples > 0
+    lines = folded.splitlines()
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) >= 1
+    assert 'test_profiler_folded_output' in folded
+
+
+def test_admin_endpoints_disabled_by_default():
+    client = TestClient(app)
+    assert client.get('/admin/diagnostics').status_code == 404
+
+
+def test_admin_profile_start_stop(monkeypatch, tmp_path):
+    loop = asyncio.new_event_loop()
+    monkeypatch.setattr(diagnostics, '_current', Diagnostics('test', loop=loop))
+    monkeypatch.setattr(diagnostics, 'PROFILE_DIR', str(tmp_path))
+    client = TestClient(app)
+
+    assert client.post('/admin/profile/stop').status_code == 409
+    assert client.post('/admin/profile/start', params={'seconds': 5}).status_code == 202
+    assert client.post('/admin/profile/start').status_code == 409
+    time.sleep(0.05)
+
+    resp = client.post('/admin/profile/stop')
+    assert resp.status_code == 200
+    assert Path(resp.headers['X-Profile-Path']).read_text() == resp.text
+    assert client.get('/admin/diagnostics').json()['profiling'] is False
+    loop.close()
+
+
+def test_expired_profile_is_kept_until_collected(monkeypatch, tmp_path):
+    loop = asyncio.new_event_loop()
+    diag = Diagnostics('test', loop=loop)
+    diag.profiler.interval = 0.001
+    monkeypatch.setattr(diagnostics, '_current', diag)
+    monkeypatch.setattr(diagnostics, 'PROFILE_DIR', str(tmp_path))
+    client = TestClient(app)
+
+    diag.start_profile(max_seconds=0.05)
+    diag.profiler._thread.join(timeout=2)
+    assert not diag.profiler.running
+    assert diag.profiler.pending
+    samples = diag.profiler.samples
+    assert samples > 0
+
+    # Vencido: no se puede iniciar otro hasta recoger este
+    assert client.post('/admin/profile/start').status_code == 409
+    body = client.get('/admin/diagnostics').json()
+    assert body['profiling'] is False and body['profile_pending'] is True
+
+    # SIGUSR2 sobre un perfil vencido lo escribe en lugar de reiniciarlo
+    diag.toggle_profiler()
+    assert not diag.profiler.pending
+    assert diag.profiler.samples == samples
+    written = list(tmp_path.glob('profile-test-*.folded'))
+    assert len(written) == 1 and written[0].read_text()
+    loop.close()
+
+
+def test_admin_stop_returns_expired_profile(monkeypatch, tmp_path):
+    loop = asyncio.new_event_loop()
+    diag = Diagnostics('test', loop=loop)
+    diag.profiler.interval = 0.001
+    monkeypatch.setattr(diagnostics, '_current', diag)
+    monkeypatch.setattr(diagnostics, 'PROFILE_DIR', str(tmp_path))
+    client = TestClient(app)
+
+    diag.start_profile(max_seconds=0.05)
+    diag.profiler._thread.join(timeout=2)
+
+    resp = client.post('/admin/profile/stop')
+    assert resp.status_code == 200
+    assert resp.text
+    assert client.post('/admin/profile/stop').status_code == 409
+    loop.close()
@@ -0,0 +1,161 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "api-gateway"))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from core.imports import IMPORTS, apply_import_status
+
+CSV = (
+    "order_id,customer_id,amount\n"
+    "H-1,C1,10.5\n"
+    'H-2,"Cliente, con\ncoma",20\n'
+    "H-3,,-1\n"
+    "H-4,C4,7\n"
+)
+
+
+@pytest.fixture
+def published(monkeypatch):
+    import routers.imports as imports_module
+    import core.imports as core_imports
+
+    events = []
+
+    async def fake_publish(event, rk):
+        events.append((rk, event))
+
+    monkeypatch.setattr(imports_module, 'publish_event', fake_publish)
+    monkeypatch.setattr(core_imports, 'IMPORT_BATCH_ROWS', 2)
+    return events
+
+
+def test_import_raw_csv_is_batched(published):
+    client = TestClient(app)
+    resp = client.post('/imports', content=CSV.encode(), headers={'content-type': 'text/csv'})
+
+    assert resp.status_code == 202
+    body = resp.json()
+    assert body['rows'] == 4 and body['batches'] == 2
+
+    batches = [e['data'] for rk, e in published if rk == 'import.batch']
+    assert [b['seq'] for b in batches] == [1, 2]
+    assert batches[0]['rows'] == [['H-1', 'C1', '10.5'], ['H-2', 'Cliente, con\ncoma', '20']]
+    assert batches[1]['rows'][0] == ['H-3', None, '-1']
+    assert published[-1][0] == 'import.completed'
+
+    # Publicado, pero los pedidos aún no están en orders
+    status = client.get(f"/imports/{body['import_id']}").json()
+    assert status['status'] == 'UPLOADED'
+    assert status['rows_received'] == 4
+    assert status['rows_loaded'] is None
+
+
+def test_import_multipart_upload(published):
+    client = TestClient(app)
+    resp = client.post('/imports', files={'file': ('historico.csv', CSV.encode(), 'text/csv')})
+
+    assert resp.status_code == 202
+    assert resp.json()['rows'] == 4
+
+
+def test_import_missing_columns(published):
+    client = TestClient(app)
+    resp = client.post('/imports', content=b"order_id,amount\nX,1\n")
+
+    assert resp.status_code == 400
+    assert not published
+
+
+def test_import_status_not_found():
+    client = TestClient(app)
+    resp = client.get('/imports/no-existe')
+    assert resp.status_code == 404
+
+
+def test_import_failure_midway_publishes_abort(published):
+    client = TestClient(app)
+    body = CSV.encode() + b"H-5,C5,\xff\n"
+    resp = client.post('/imports', content=body)
+
+    assert resp.status_code == 400
+    routing_keys = [rk for rk, _ in published]
+    # Los lotes ya publicados se descartan en el legacy-service
+    assert routing_keys == ['import.batch', 'import.batch', 'import.failed']
+    assert 'import.completed' not in routing_keys
+
+
+def test_stray_quote_does_not_buffer_the_rest_of_the_upload():
+    import asyncio
+    from core.imports import CsvImportPipeline
+
+    published = []
+
+    async def publish(event, rk):
+        published.append(rk)
+
+    async def scenario():
+        pipeline = CsvImportPipeline('pulgadas', publish, batch_rows=2)
+        await pipeline.feed(b"order_id,customer_id,amount\nQ-1,Tienda 5\" pulgadas,10\n")
+        for i in range(2, 1000):
+            await pipeline.feed(f"Q-{i},C{i},{i}\n".encode())
+        # Los lotes salen mientras se sube, no recién en finish()
+        assert published.count('import.batch') == 499
+        assert len(pipeline._record) == 0
+        await pipeline.finish()
+
+    asyncio.run(scenario())
+    IMPORTS.pop('pulgadas')
+
+
+def test_import_unclosed_quote_is_bounded(published, monkeypatch):
+    from common import csvrecords
+    monkeypatch.setattr(csvrecords, 'MAX_RECORD_BYTES', 1024)
+    client = TestClient(app)
+    body = b'order_id,customer_id,amount\nX-1,"sin cerrar,1\n' + b"X-2,C2,2\n" * 500
+    resp = client.post('/imports', content=body)
+    assert resp.status_code == 400
+    assert 'comillas' in resp.json()['detail']
+    assert 'import.completed' not in [rk for rk, _ in published]
+
+
+def test_import_csv_error_is_client_error(published):
+    client = TestClient(app)
+    # Campo de más de 128 KiB: csv.Error, que no es ValueError
+    body = b"order_id,customer_id,amount\nX-1," + b"x" * 200_000 + b",1\n"
+    resp = client.post('/imports', content=body)
+    assert resp.status_code == 400
+    assert 'CSV inválido' in resp.json()['detail']
+
+
+def test_import_client_supplied_id(published):
+    client = TestClient(app)
+    headers = {'X-Import-Id': 'carga-2024-01'}
+    resp = client.post('/imports', content=CSV.encode(), headers=headers)
+    assert resp.status_code == 202
+    assert resp.json()['import_id'] == 'carga-2024-01'
+    assert all(e['data']['import_id'] == 'carga-2024-01' for _, e in published)
+
+    assert client.post('/imports', content=CSV.encode(), headers=headers).status_code == 409
+    assert client.post('/imports', content=CSV.encode(), headers={'X-Import-Id': '../x'}).status_code == 400
+    IMPORTS.pop('carga-2024-01')
+
+
+def test_import_status_follows_legacy_progress(published):
+    client = TestClient(app)
+    import_id = client.post('/imports', content=CSV.encode()).json()['import_id']
+
+    apply_import_status({'stage': 'staged', 'data': {
+        'import_id': import_id, 'batches_staged': 2, 'rows_staged': 3, 'rows_rejected': 1}})
+    status = client.get(f"/imports/{import_id}").json()
+    assert (status['status'], status['rows_staged'], status['rows_rejected']) == ('UPLOADED', 3, 1)
+
+    apply_import_status({'stage': 'loaded', 'data': {
+        'import_id': import_id, 'rows_loaded': 2, 'rows_duplicated': 1, 'rows_rejected': 1}})
+    status = client.get(f"/imports/{import_id}").json()
+    assert status['status'] == 'LOADED'
+    assert (status['rows_loaded'], status['rows_duplicated']) == (2, 1)
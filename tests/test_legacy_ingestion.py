@@ -0,0 +1,344 @@
+import gzip
+import uuid
+
+import pandas as pd
+import pytest
+
+from conftest import load_worker
+
+legacy = load_worker("legacy-service")
+
+CSV = (
+    "order_id,customer_id,amount\n"
+    "L-1,C1,10\n"
+    'L-2,"Cliente\ncon salto",20\n'
+    "L-3,C3,30\n"
+    'L-4,"Otro, ""raro""",40\n'
+    "L-5,C5,50\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(legacy, 'CHUNK_ROWS', 2)
+
+
+def read_all(path, start=0):
+    chunks = list(legacy.iter_chunks(str(path), start))
+    return [df['order_id'].tolist() for df, _ in chunks], [pos for _, pos in chunks]
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.csv.gz'])
+def test_csv_resume_from_byte_offset(tmp_path, suffix):
+    path = tmp_path / f"historico{suffix}"
+    data = CSV.encode()
+    path.write_bytes(gzip.compress(data) if suffix == '.csv.gz' else data)
+
+    ids, positions = read_all(path)
+    assert ids == [['L-1', 'L-2'], ['L-3', 'L-4'], ['L-5']]
+    # Los offsets son del CSV sin comprimir y el último es el final del archivo
+    assert positions[-1] == len(data)
+
+    # Reanudar desde cada checkpoint entrega exactamente lo que faltaba
+    for i, position in enumerate(positions):
+        assert read_all(path, position)[0] == ids[i + 1:]
+
+    df = next(legacy.iter_chunks(str(path), 0))[0]
+    assert df['customer_id'].tolist() == ['C1', 'Cliente\ncon salto']
+    df = next(legacy.iter_chunks(str(path), positions[0]))[0]
+    assert df['customer_id'].tolist() == ['C3', 'Otro, "raro"']
+
+
+def test_parquet_resume_skips_row_groups(tmp_path):
+    path = tmp_path / "historico.parquet"
+    df = pd.DataFrame({
+        'order_id': [f"P-{i}" for i in range(7)],
+        'customer_id': [f"C{i}" for i in range(7)],
+        'amount': [float(i + 1) for i in range(7)],
+        'extra': ['x'] * 7,
+    })
+    df.to_parquet(path, row_group_size=3)
+
+    ids, positions = read_all(path)
+    assert sum(ids, []) == df['order_id'].tolist()
+    assert positions[-1] == 7
+
+    # Desde la fila 4: el primer row group (filas 0-2) ni se lee, la fila 3 se descarta
+    resumed, resumed_positions = read_all(path, 4)
+    assert sum(resumed, []) == ['P-4', 'P-5', 'P-6']
+    assert resumed_positions[-1] == 7
+    assert read_all(path, 7)[0] == []
+
+
+def test_missing_columns_rejected(tmp_path):
+    path = tmp_path / "malo.csv"
+    path.write_text("order_id,amount\nX,1\n")
+    with pytest.raises(ValueError):
+        read_all(path)
+
+
+def test_stray_quote_in_unquoted_field_keeps_chunks(tmp_path):
+    # Una comilla suelta dentro de un campo sin comillas es literal (como en pandas)
+    path = tmp_path / "pulgadas.csv"
+    rows = [f"Q-{i},Tienda 5\" pulgadas,{i + 1}\n" if i == 0 else f"Q-{i},C{i},{i + 1}\n" for i in range(201)]
+    path.write_text("order_id,customer_id,amount\n" + "".join(rows))
+
+    chunks = list(legacy.iter_chunks(str(path), 0))
+    assert len(chunks) == 101
+    assert chunks[0][0]['customer_id'].tolist() == ['Tienda 5" pulgadas', 'C1']
+    assert sum(len(df) for df, _ in chunks) == 201
+
+
+def test_unclosed_quote_fails_file_instead_of_buffering(tmp_path, monkeypatch):
+    from common import csvrecords
+    monkeypatch.setattr(csvrecords, 'MAX_RECORD_BYTES', 1024)
+    path = tmp_path / "roto.csv"
+    path.write_text('order_id,customer_id,amount\nX-1,"sin cerrar,1\n' + "X-2,C2,2\n" * 500)
+    with pytest.raises(ValueError):
+        read_all(path)
+
+
+def test_validate_chunk_rejects_values_outside_column_limits():
+    df = pd.DataFrame({
+        'order_id': ['OK-1', 'X' * 51, 'OK-3', 'OK-4', 'OK-5'],
+        'customer_id': ['C1', 'C2', 'C' * 51, None, 'C5'],
+        'amount': ['10', '20', '30', '100000000', '99999999.99'],
+    })
+    rows, rejected = legacy.validate_chunk(df)
+    assert rejected == 3
+    assert rows == [('OK-1', 'C1', 10.0), ('OK-5', 'C5', 99999999.99)]
+
+
+def test_load_chunk_commits_rows_with_checkpoint(db):
+    key = f"test:{uuid.uuid4()}"
+    prefix = f"T-{uuid.uuid4().hex[:8]}"
+    rows = [(f"{prefix}-1", 'C1', 10.0), (f"{prefix}-2", 'C2', 20.0)]
+
+    assert legacy.load_chunk(db, key, rows, 123) == 2
+    assert legacy.load_checkpoint(db, key) == (123, 2)
+    # Los repetidos no cuentan como importados
+    assert legacy.load_chunk(db, key, rows[:1], 124) == 0
+    assert legacy.load_checkpoint(db, key) == (124, 2)
+
+    # Si la carga falla, ni las filas ni el checkpoint avanzan
+    with pytest.raises(Exception):
+        legacy.load_chunk(db, key, [(f"{prefix}-3", 'C3', 'no-es-numero')], 456)
+    db.rollback()
+    assert legacy.load_checkpoint(db, key) == (124, 2)
+
+    cur = db.cursor()
+    cur.execute("SELECT count(*) FROM orders WHERE order_id LIKE %s", (f"{prefix}-%",))
+    assert cur.fetchone()[0] == 2
+    legacy.clear_checkpoint(key)
+
+
+def test_process_csv_resumes_and_clears_checkpoint_on_failure(db, tmp_path, monkeypatch):
+    prefix = f"R-{uuid.uuid4().hex[:8]}"
+    path = tmp_path / "historico.csv"
+    path.write_text(CSV.replace("L-", f"{prefix}-"))
+    key = legacy.file_key(str(path))
+    _, positions = read_all(path)
+
+    # Un checkpoint tras el primer bloque: solo se cargan los bloques siguientes
+    legacy.load_chunk(db, key, [], positions[0])
+    assert legacy.process_csv(str(path))
+    cur = db.cursor()
+    cur.execute("SELECT order_id FROM orders WHERE order_id LIKE %s ORDER BY order_id", (f"{prefix}-%",))
+    assert [r[0] for r in cur.fetchall()] == [f"{prefix}-3", f"{prefix}-4", f"{prefix}-5"]
+    assert legacy.load_checkpoint(db, key) == (0, 0)
+
+    # Falla a mitad de archivo: lo cargado queda y el checkpoint se borra
+    other = tmp_path / "roto.csv"
+    other.write_text(CSV.replace("L-", f"{prefix}-x"))
+    real_iter = legacy.iter_chunks
+
+    def broken(filepath, start):
+        chunks = real_iter(filepath, start)
+        yield next(chunks)
+        raise ValueError("archivo truncado")
+
+    monkeypatch.setattr(legacy, 'iter_chunks', broken)
+    other_key = legacy.file_key(str(other))
+    assert not legacy.process_csv(str(other))
+    assert legacy.load_checkpoint(db, other_key) == (0, 0)
+
+
+def import_event(event_type, import_id, **data):
+    return {'event_type': event_type, 'data': {'import_id': import_id, **data}}
+
+
+def batch(import_id, seq, rows):
+    return import_event('ImportBatch', import_id, seq=seq, first_row=0,
+                        columns=['order_id', 'customer_id', 'amount'], rows=rows)
+
+
+def count_orders(db, prefix):
+    cur = db.cursor()
+    cur.execute("SELECT count(*) FROM orders WHERE order_id LIKE %s", (f"{prefix}%",))
+    return cur.fetchone()[0]
+
+
+def test_api_import_is_visible_only_after_completed(db):
+    import_id = uuid.uuid4().hex
+    p = f"I-{import_id[:8]}-"
+    existing = f"{p}0"
+    legacy.load_chunk(db, f"test:{import_id}", [(existing, 'C0', 5.0)], 1)
+
+    rk, data = legacy.load_import_batch(batch(import_id, 1, [[f"{p}1", 'C1', '10'], [f"{p}2", None, '-1']]))
+    assert rk == 'import_status.staged'
+    assert (data['rows_staged'], data['rows_rejected']) == (1, 1)
+    legacy.load_import_batch(batch(import_id, 2, [[f"{p}3", 'C3', '30'], [existing, 'C0', '5']]))
+    # Reentrega de un lote ya guardado
+    assert legacy.load_import_batch(batch(import_id, 2, [[f"{p}3", 'C3', '30']])) is None
+    assert count_orders(db, p) == 1
+
+    rk, data = legacy.load_import_batch(import_event('ImportCompleted', import_id, batches=2, rows=4))
+    assert rk == 'import_status.loaded'
+    assert data == {'rows_loaded': 2, 'rows_duplicated': 1, 'rows_rejected': 1}
+    assert count_orders(db, p) == 3
+    # Reentrega del ImportCompleted: se reenvía el mismo resultado sin volver a cargar nada
+    again = legacy.load_import_batch(import_event('ImportCompleted', import_id, batches=2, rows=4))
+    assert again == (rk, data)
+    assert count_orders(db, p) == 3
+    # Un lote que llega tarde no vuelve a staging
+    assert legacy.load_import_batch(batch(import_id, 1, [[f"{p}9", 'C9', '90']])) is None
+    assert legacy.load_import_progress(db, f"upload:{import_id}") == (0, 0, 0)
+    legacy.clear_checkpoint(f"test:{import_id}")
+
+
+def test_api_import_header_only_is_loaded_empty(db):
+    import_id = uuid.uuid4().hex
+    rk, data = legacy.load_import_batch(import_event('ImportCompleted', import_id, batches=0, rows=0))
+    assert rk == 'import_status.loaded'
+    assert data == {'rows_loaded': 0, 'rows_duplicated': 0, 'rows_rejected': 0}
+    assert legacy.load_import_batch(import_event('ImportCompleted', import_id, batches=0, rows=0)) == (rk, data)
+
+
+def test_api_import_with_every_batch_dead_lettered_is_aborted(db):
+    # El único lote terminó en la DLQ: no hay checkpoint, pero tampoco se cargó nada
+    import_id = uuid.uuid4().hex
+    rk, data = legacy.load_import_batch(import_event('ImportCompleted', import_id, batches=1, rows=1))
+    assert rk == 'import_status.aborted'
+    assert '0 de 1' in data['error']
+    # La reentrega repite el mismo resultado
+    assert legacy.load_import_batch(import_event('ImportCompleted', import_id, batches=1, rows=1)) == (rk, data)
+
+
+def test_api_import_failed_or_incomplete_is_discarded(db):
+    import_id = uuid.uuid4().hex
+    p = f"F-{import_id[:8]}-"
+    legacy.load_import_batch(batch(import_id, 1, [[f"{p}1", 'C1', '10']]))
+    rk, _ = legacy.load_import_batch(import_event('ImportFailed', import_id, error='UTF-8 inválido'))
+    assert rk == 'import_status.aborted'
+
+    # Falta el lote 2 (p. ej. terminó en la DLQ): tampoco se publica
+    other = uuid.uuid4().hex
+    legacy.load_import_batch(batch(other, 1, [[f"{p}2", 'C2', '20']]))
+    rk, data = legacy.load_import_batch(import_event('ImportCompleted', other, batches=2, rows=2))
+    assert rk == 'import_status.aborted'
+    assert count_orders(db, p) == 0
+
+    cur = db.cursor()
+    cur.execute("SELECT count(*) FROM legacy_import_staging WHERE import_key IN (%s, %s)",
+                (f"upload:{import_id}", f"upload:{other}"))
+    assert cur.fetchone()[0] == 0
+
+
+def test_api_import_end_to_end_in_process(db):
+    import_id = uuid.uuid4().hex
+    p = f"E-{import_id[:8]}-"
+    status = run_api_import(import_id, f"order_id,customer_id,amount\n{p}1,C1,10\n{p}2,C2,0\n{p}3,C3,30\n")
+    assert status['status'] == 'LOADED'
+    assert (status['rows_loaded'], status['rows_rejected'], status['batches_staged']) == (2, 1, 2)
+    assert count_orders(db, p) == 2
+
+
+def run_api_import(import_id, csv_text):
+    """Sube `csv_text` por el pipeline del gateway con el legacy-service en memoria."""
+    import asyncio
+    import sys
+    from conftest import ROOT
+    sys.path.insert(0, str(ROOT / "api-gateway"))
+    from core.imports import CsvImportPipeline, IMPORTS, handle_import_status
+    from common.transport import InProcessTransport
+
+    async def scenario():
+        transport = InProcessTransport()
+        await legacy.consume_imports(transport)
+        await transport.subscribe('q_gateway_import_status', ['import_status.#'], handle_import_status)
+
+        pipeline = CsvImportPipeline(import_id, transport.publish, batch_rows=2)
+        await pipeline.feed(csv_text.encode())
+        await pipeline.finish()
+        await transport.join()
+        await transport.close()
+
+    asyncio.run(scenario())
+    return IMPORTS.pop(import_id)
+
+
+def test_api_import_header_only_end_to_end(db):
+    status = run_api_import(uuid.uuid4().hex, "order_id,customer_id,amount\n")
+    assert status['status'] == 'LOADED'
+    assert (status['rows_loaded'], status['batches_published']) == (0, 0)
+
+
+def test_api_import_dead_lettered_batch_end_to_end(db, monkeypatch):
+    def broken_stage(*args):
+        raise RuntimeError("value too long for type character varying(50)")
+
+    monkeypatch.setattr(legacy, 'stage_chunk', broken_stage)
+    p = f"DL-{uuid.uuid4().hex[:8]}-"
+    status = run_api_import(uuid.uuid4().hex, f"order_id,customer_id,amount\n{p}1,C1,10\n")
+    assert status['status'] == 'FAILED'
+    assert '0 de 1' in status['error']
+    assert count_orders(db, p) == 0
+
+
+def test_process_csv_keeps_file_and_checkpoint_when_postgres_drops(db, tmp_path, monkeypatch):
+    import psycopg2
+    prefix = f"D-{uuid.uuid4().hex[:8]}"
+    path = tmp_path / "historico.csv"
+    path.write_text(CSV.replace("L-", f"{prefix}-"))
+    key = legacy.file_key(str(path))
+    real_iter = legacy.iter_chunks
+
+    def drops(filepath, start):
+        chunks = real_iter(filepath, start)
+        yield next(chunks)
+        raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    # Error transitorio: ni éxito ni /error, y el checkpoint del primer bloque se conserva
+    monkeypatch.setattr(legacy, 'iter_chunks', drops)
+    assert legacy.process_csv(str(path)) is None
+    position, loaded = legacy.load_checkpoint(db, key)
+    assert position > 0 and loaded == 2
+
+    # El siguiente escaneo retoma desde ese bloque
+    monkeypatch.setattr(legacy, 'iter_chunks', real_iter)
+    assert legacy.process_csv(str(path)) is True
+    assert count_orders(db, f"{prefix}-") == 5
+    assert legacy.load_checkpoint(db, key) == (0, 0)
+
+
+def test_watch_inbox_leaves_file_on_transient_error(tmp_path, monkeypatch):
+    inbox, processed, error = (tmp_path / d for d in ("inbox", "processed", "error"))
+    for d in (inbox, processed, error):
+        d.mkdir()
+    (inbox / "historico.csv").write_text(CSV)
+    monkeypatch.setattr(legacy, 'INBOX_DIR', str(inbox))
+    monkeypatch.setattr(legacy, 'PROCESSED_DIR', str(processed))
+    monkeypatch.setattr(legacy, 'ERROR_DIR', str(error))
+    monkeypatch.setattr(legacy, 'process_csv', lambda filepath: None)
+
+    class Stop(Exception):
+        pass
+
+    def stop(seconds):
+        raise Stop()
+
+    monkeypatch.setattr(legacy.time, 'sleep', stop)
+    with pytest.raises(Stop):
+        legacy.watch_inbox()
+    assert [p.name for p in inbox.iterdir()] == ["historico.csv"]
+    assert not list(error.iterdir()) and not list(processed.iterdir())
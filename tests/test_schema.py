@@ -0,0 +1,206 @@
+import threading
+import time
+import uuid
+from datetime import date
+
+import psycopg2
+import pytest
+
+from common.db import get_db_connection
+from common.schema import MIGRATIONS, apply_migrations, create_order_partition, init_schema
+
+MONTH = date(2099, 1, 1)
+PARTITION = "orders_p2099_01"
+
+
+def rollup_total(cur):
+    cur.execute("SELECT COALESCE(sum(order_count), 0) FROM orders_rollup_daily WHERE bucket >= %s", (MONTH,))
+    return cur.fetchone()[0]
+
+
+def test_partition_created_over_rows_in_default(db):
+    cur = db.cursor()
+    cur.execute(f"DROP TABLE IF EXISTS {PARTITION}")
+    cur.execute("DELETE FROM order_keys WHERE created_at >= %s", (MONTH,))
+    db.commit()
+    try:
+        # Sin partición para 2099-01 los pedidos caen en orders_default
+        cur.execute("""
+            INSERT INTO orders (order_id, customer_id, status, amount, created_at)
+            VALUES ('FUT-1', 'C1', 'CONFIRMED', 10, '2099-01-05'), ('FUT-2', 'C2', 'CONFIRMED', 20, '2099-01-20')
+        """)
+        db.commit()
+        cur.execute("SELECT count(*) FROM orders_default WHERE created_at >= %s", (MONTH,))
+        assert cur.fetchone()[0] == 2
+        before = rollup_total(cur)
+
+        assert create_order_partition(db, MONTH)
+        assert not create_order_partition(db, MONTH)
+
+        cur.execute("SELECT tableoid::regclass::text, count(*) FROM orders WHERE created_at >= %s GROUP BY 1", (MONTH,))
+        assert cur.fetchall() == [(PARTITION, 2)]
+        # Mover filas no es un pedido nuevo: los rollups no cambian
+        assert rollup_total(cur) == before
+        # El arranque sigue funcionando con la partición ya adjunta
+        init_schema()
+    finally:
+        db.rollback()
+        cur.execute("DELETE FROM orders WHERE created_at >= %s", (MONTH,))
+        cur.execute("DELETE FROM order_keys WHERE created_at >= %s", (MONTH,))
+        cur.execute(f"DROP TABLE IF EXISTS {PARTITION}")
+        db.commit()
+
+
+def test_concurrent_partition_creation_is_not_an_error(db, capsys):
+    month = date(2099, 3, 1)
+    name = "orders_p2099_03"
+    other = get_db_connection()
+    cur, other_cur = db.cursor(), other.cursor()
+    cur.execute(f"DROP TABLE IF EXISTS {name}")
+    db.commit()
+    try:
+        # Otro worker ya tiene el lock y está creando la partición (sin confirmar todavía)
+        other_cur.execute("LOCK TABLE orders_default IN EXCLUSIVE MODE")
+        other_cur.execute(f"CREATE TABLE {name} PARTITION OF orders FOR VALUES FROM ('2099-03-01') TO ('2099-04-01')")
+
+        results = []
+        worker = threading.Thread(target=lambda: results.append(create_order_partition(get_db_connection(), month)))
+        worker.start()
+        time.sleep(0.3)  # queda esperando el LOCK TABLE
+        assert worker.is_alive()
+        other.commit()
+        worker.join(timeout=10)
+
+        assert results == [False]
+        assert "No se pudo crear la partición" not in capsys.readouterr().out
+    finally:
+        other.rollback()
+        other.close()
+        cur.execute(f"DROP TABLE IF EXISTS {name}")
+        db.commit()
+
+
+def rollup(cur, customer_id):
+    cur.execute("""
+        SELECT status, order_count, total_amount FROM orders_rollup_daily
+        WHERE customer_id = %s AND (order_count <> 0 OR total_amount <> 0) ORDER BY status
+    """, (customer_id,))
+    daily = cur.fetchall()
+    cur.execute("""
+        SELECT status, sum(order_count), sum(total_amount) FROM orders_rollup_hourly
+        WHERE customer_id = %s GROUP BY status HAVING sum(order_count) <> 0 OR sum(total_amount) <> 0
+        ORDER BY status
+    """, (customer_id,))
+    assert cur.fetchall() == daily  # hora y día siempre suman lo mismo
+    return [(status, count, float(amount)) for status, count, amount in daily]
+
+
+def test_rollup_triggers_track_insert_update_and_delete(db):
+    customer = f"RU-{uuid.uuid4().hex[:8]}"
+    prefix = f"{customer}-"
+    cur = db.cursor()
+    try:
+        # Un solo INSERT de varias filas: un merge agregado por sentencia
+        cur.execute("""
+            INSERT INTO orders (order_id, customer_id, status, amount, created_at) VALUES
+                (%s, %s, 'RESERVED', 10, '2098-05-01 10:15'),
+                (%s, %s, 'RESERVED', 20, '2098-05-01 11:30'),
+                (%s, %s, 'RESERVED', 5, '2098-05-01 11:45')
+        """, (f"{prefix}1", customer, f"{prefix}2", customer, f"{prefix}3", customer))
+        db.commit()
+        assert rollup(cur, customer) == [('RESERVED', 3, 35.0)]
+
+        # RESERVED -> CONFIRMED: -1 en el estado viejo, +1 en el nuevo
+        cur.execute("UPDATE orders SET status = 'CONFIRMED' WHERE order_id IN (%s, %s)", (f"{prefix}1", f"{prefix}2"))
+        db.commit()
+        assert rollup(cur, customer) == [('CONFIRMED', 2, 30.0), ('RESERVED', 1, 5.0)]
+
+        cur.execute("SELECT total_orders, total_revenue FROM analytics_daily WHERE date = '2098-05-01'")
+        total_orders, total_revenue = cur.fetchone()
+        assert total_orders >= 2 and float(total_revenue) >= 30.0
+
+        # Un repetido (order_keys) no llega a orders ni a los rollups
+        cur.execute("INSERT INTO orders (order_id, customer_id, status, amount, created_at) "
+                    "VALUES (%s, %s, 'RESERVED', 99, '2098-05-01 12:00')", (f"{prefix}3", customer))
+        db.commit()
+        assert rollup(cur, customer) == [('CONFIRMED', 2, 30.0), ('RESERVED', 1, 5.0)]
+
+        cur.execute("DELETE FROM orders WHERE order_id = %s", (f"{prefix}3",))
+        db.commit()
+        assert rollup(cur, customer) == [('CONFIRMED', 2, 30.0)]
+    finally:
+        db.rollback()
+        cur.execute("DELETE FROM orders WHERE customer_id = %s", (customer,))
+        cur.execute("DELETE FROM order_keys WHERE order_id LIKE %s", (f"{prefix}%",))
+        db.commit()
+
+
+def test_migrations_upgrade_unpartitioned_orders_table():
+    """Camino destructivo de _m0001: tabla orders original (sin particionar) con repetidos."""
+    try:
+        conn = get_db_connection()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Postgres no disponible: {e}")
+    schema = f"upgrade_{uuid.uuid4().hex[:8]}"
+    cur = conn.cursor()
+    try:
+        cur.execute(f"CREATE SCHEMA {schema}")
+        cur.execute(f"SET search_path TO {schema}")
+        # Esquema de antes de las migraciones (lo creaban los workers al arrancar)
+        cur.execute("""
+            CREATE TABLE orders (
+                id SERIAL PRIMARY KEY,
+                order_id VARCHAR(50) NOT NULL,
+                customer_id VARCHAR(50),
+                status VARCHAR(20),
+                amount DECIMAL(10, 2),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE analytics_daily (
+                date DATE PRIMARY KEY DEFAULT CURRENT_DATE,
+                total_orders INT DEFAULT 0,
+                total_revenue DECIMAL(15, 2) DEFAULT 0.00,
+                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            INSERT INTO orders (order_id, customer_id, status, amount, created_at, updated_at) VALUES
+                ('A', 'C1', 'RESERVED', 10, '2024-01-10 09:00', '2024-01-10 09:00'),
+                ('A', 'C1', 'CONFIRMED', 10, '2024-01-10 09:00', '2024-01-10 09:05'),
+                ('B', 'C2', 'CONFIRMED', 20, '2024-02-01 12:00', NULL),
+                ('B', 'C2', 'RESERVED', 20, '2024-02-01 12:00', '2024-02-01 12:00'),
+                ('C', NULL, 'IMPORTED', 30, NULL, NULL);
+            INSERT INTO analytics_daily (date, total_orders, total_revenue) VALUES ('2024-01-10', 1, 10);
+        """)
+        conn.commit()
+
+        apply_migrations(conn)
+
+        cur.execute("SELECT relkind FROM pg_class WHERE oid = 'orders'::regclass")
+        assert cur.fetchone()[0] == 'p'
+        cur.execute("SELECT to_regclass('orders_unpartitioned'), to_regclass('orders_p2024_01')")
+        assert cur.fetchone() == (None, 'orders_p2024_01')
+
+        # De cada repetido queda la versión más reciente (updated_at NULL cuenta como la más vieja)
+        cur.execute("SELECT order_id, status, tableoid::regclass::text FROM orders ORDER BY order_id")
+        rows = cur.fetchall()
+        assert [r[:2] for r in rows] == [('A', 'CONFIRMED'), ('B', 'RESERVED'), ('C', 'IMPORTED')]
+        assert rows[0][2] == 'orders_p2024_01' and rows[1][2] == 'orders_p2024_02'
+        cur.execute("SELECT order_id FROM order_keys ORDER BY order_id")
+        assert [r[0] for r in cur.fetchall()] == ['A', 'B', 'C']
+
+        # La secuencia sigue después del id más alto copiado
+        cur.execute("SELECT max(id) FROM orders")
+        max_id = cur.fetchone()[0]
+        cur.execute("INSERT INTO orders (order_id, status, amount) VALUES ('D', 'RESERVED', 1) RETURNING id")
+        assert cur.fetchone()[0] > max_id
+
+        # analytics_daily pasa a ser la vista sobre los rollups (backfill de lo migrado)
+        cur.execute("SELECT total_orders, total_revenue FROM analytics_daily WHERE date = '2024-01-10'")
+        assert cur.fetchone() == (1, 10)
+        cur.execute("SELECT count(*) FROM schema_migrations")
+        assert cur.fetchone()[0] == len(MIGRATIONS)
+    finally:
+        conn.rollback()
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.commit()
+        conn.close()
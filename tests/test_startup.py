@@ -0,0 +1,60 @@
+import asyncio
+
+import psycopg2
+import pytest
+
+from common import startup
+
+
+def test_retry_until_ready_retries_only_listed_errors():
+    calls = []
+
+    async def probe():
+        calls.append(1)
+        if len(calls) < 3:
+            raise psycopg2.OperationalError("connection refused")
+        return "ok"
+
+    result = asyncio.run(startup.retry_until_ready("Postgres", probe, retry_on=psycopg2.OperationalError))
+    assert result == "ok"
+    assert len(calls) == 3
+
+
+def test_retry_until_ready_fails_fast_on_other_errors():
+    calls = []
+
+    async def probe():
+        calls.append(1)
+        raise psycopg2.errors.SyntaxError("error de sintaxis en la migración")
+
+    with pytest.raises(psycopg2.errors.SyntaxError):
+        asyncio.run(startup.retry_until_ready("Postgres", probe, retry_on=psycopg2.OperationalError))
+    assert len(calls) == 1
+
+
+def test_wait_for_postgres_does_not_retry_schema_errors(monkeypatch):
+    calls = []
+
+    def broken_schema():
+        calls.append(1)
+        raise psycopg2.errors.UndefinedColumn("column \"amount\" does not exist")
+
+    monkeypatch.setattr(startup, "_init_database", broken_schema)
+    with pytest.raises(psycopg2.errors.UndefinedColumn):
+        asyncio.run(startup.wait_for_postgres())
+    assert len(calls) == 1
+
+
+def test_ready_file_written_by_mark_ready_not_start_worker(monkeypatch, tmp_path):
+    ready_file = tmp_path / "ready"
+    ready_file.write_text("arranque anterior\n")
+    monkeypatch.setattr(startup, "READY_FILE", str(ready_file))
+
+    # Sin dependencias: solo la parte de READY_FILE
+    transport = asyncio.run(startup.start_worker("Worker", postgres=False, rabbitmq=False))
+    assert transport is None
+    assert not ready_file.exists()
+
+    startup.mark_ready("Worker")
+    assert float(ready_file.read_text()) >= 0
+    assert ready_file.read_text().endswith("\n")
@@ -0,0 +1,108 @@
+import sys
+import gzip
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "api-gateway"))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from core import static
+from core.static import PrecompressedStaticFiles, parse_accept_encoding
+
+INDEX = (ROOT / "frontend-portal" / "index.html").read_bytes()
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def test_index_served_with_etag_and_cache_headers(client):
+    resp = client.get('/', headers={'Accept-Encoding': 'identity'})
+    assert resp.status_code == 200
+    assert resp.content == INDEX
+    assert resp.headers['content-type'] == 'text/html; charset=utf-8'
+    assert resp.headers['cache-control'] == 'no-cache'
+    assert 'Accept-Encoding' in resp.headers['vary']
+    assert resp.headers['etag'].startswith('"')
+    assert 'content-encoding' not in resp.headers
+
+
+def test_gzip_variant_and_conditional_request(client):
+    resp = client.get('/index.html', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['content-encoding'] == 'gzip'
+    # httpx ya descomprime el cuerpo
+    assert resp.content == INDEX
+    assert int(resp.headers['content-length']) < len(INDEX)
+
+    etag = resp.headers['etag']
+    cached = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.content == b''
+    assert cached.headers['etag'] == etag
+
+    assert client.get('/', headers={'If-None-Match': '"otro"'}).status_code == 200
+
+
+def test_etag_of_other_encoding_does_not_match(client):
+    gz = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    gzip_etag = gz.headers['etag']
+
+    # El cliente tiene la variante gzip pero ahora pide identity: hay que mandar el cuerpo
+    resp = client.get('/', headers={'Accept-Encoding': 'identity', 'If-None-Match': gzip_etag})
+    assert resp.status_code == 200
+    assert resp.content == INDEX
+    assert resp.headers['etag'] != gzip_etag
+    assert 'content-encoding' not in resp.headers
+
+    # Con la lista completa de ETags del cliente sí coincide la variante servida
+    both = f"{gzip_etag}, {resp.headers['etag']}"
+    assert client.get('/', headers={'Accept-Encoding': 'identity', 'If-None-Match': both}).status_code == 304
+
+
+def test_brotli_preferred_when_available(tmp_path, monkeypatch):
+    class FakeBrotli:
+        @staticmethod
+        def compress(data, quality):
+            return b'br:' + gzip.compress(data)
+
+    monkeypatch.setattr(static, 'brotli', FakeBrotli)
+    (tmp_path / 'app.js').write_text('console.log("hola");\n' * 100)
+    client = TestClient(PrecompressedStaticFiles(tmp_path))
+
+    resp = client.get('/app.js', headers={'Accept-Encoding': 'gzip, br'})
+    assert resp.headers['content-encoding'] == 'br'
+    assert resp.headers['cache-control'] == f'public, max-age={static.STATIC_MAX_AGE}'
+    # Cada codificación tiene su propio ETag fuerte
+    gz = client.get('/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert gz.headers['etag'] != resp.headers['etag']
+
+    resp = client.get('/app.js', headers={'Accept-Encoding': 'br;q=0, gzip'})
+    assert resp.headers['content-encoding'] == 'gzip'
+
+
+def test_small_files_missing_paths_and_methods(tmp_path):
+    (tmp_path / 'tiny.txt').write_text('ok')
+    (tmp_path / '.env').write_text('SECRET=1')
+    client = TestClient(PrecompressedStaticFiles(tmp_path))
+
+    resp = client.get('/tiny.txt', headers={'Accept-Encoding': 'gzip'})
+    assert resp.text == 'ok'
+    assert 'content-encoding' not in resp.headers
+
+    head = client.head('/tiny.txt')
+    assert head.status_code == 200
+    assert head.headers['content-length'] == '2'
+
+    assert client.get('/.env').status_code == 404
+    assert client.get('/nada.html').status_code == 404
+    assert client.post('/tiny.txt').status_code == 405
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding('gzip, deflate, br') == {'gzip', 'deflate', 'br'}
+    assert parse_accept_encoding('br;q=0, gzip;q=0.5') == {'gzip'}
+    assert parse_accept_encoding('') == set()
@@ -0,0 +1,168 @@
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "api-gateway"))
+
+import httpx
+import pytest
+
+from common.transport import InProcessTransport, topic_matches
+
+ORDER = {'customer_id': 'CUST-1', 'items': [{'product_id': 'P1', 'quantity': 1}]}
+
+
+@pytest.mark.parametrize('pattern, key, expected', [
+    ('order.created', 'order.created', True),
+    ('order.created', 'order.confirmed', False),
+    ('order.#', 'order.created', True),
+    ('order.#', 'order', True),
+    ('order.#', 'order.a.b', True),
+    ('order.#', 'import.batch', False),
+    ('order.*', 'order.created', True),
+    ('order.*', 'order.a.b', False),
+    ('order.*', 'order', False),
+    ('#', 'cualquier.cosa', True),
+    ('*.confirmed', 'order.confirmed', True),
+    ('#.confirmed', 'order.x.confirmed', True),
+    ('#.confirmed', 'order.created', False),
+])
+def test_topic_matches(pattern, key, expected):
+    assert topic_matches(pattern, key) is expected
+
+
+def test_in_process_routing_and_chaining():
+    received = {'inventory': [], 'notifications': [], 'analytics': []}
+
+    async def scenario():
+        transport = InProcessTransport()
+
+        async def inventory(message):
+            async with message.process():
+                body = json.loads(message.body)
+                received['inventory'].append(body['data']['order_id'])
+                await transport.publish({'event_type': 'OrderConfirmed', 'data': body['data']}, 'order.confirmed')
+
+        def collector(name):
+            async def handler(message):
+                async with message.process():
+                    received[name].append((message.routing_key, json.loads(message.body)['event_type']))
+            return handler
+
+        await transport.subscribe('q_inventory', ['order.created'], inventory)
+        await transport.subscribe('q_notifications', ['order.#'], collector('notifications'))
+        await transport.subscribe('q_analytics', ['order.confirmed'], collector('analytics'))
+
+        await transport.publish({'event_type': 'OrderCreated', 'data': {'order_id': 'A'}}, 'order.created')
+        await transport.publish({'event_type': 'ImportBatch'}, 'import.batch')
+        await transport.join()
+        await transport.close()
+
+    asyncio.run(scenario())
+    assert received['inventory'] == ['A']
+    assert sorted(received['notifications']) == [
+        ('order.confirmed', 'OrderConfirmed'),
+        ('order.created', 'OrderCreated'),
+    ]
+    assert received['analytics'] == [('order.confirmed', 'OrderConfirmed')]
+
+
+def test_in_process_dead_letter_and_requeue():
+    attempts = []
+
+    async def scenario():
+        transport = InProcessTransport()
+
+        async def flaky(message):
+            attempts.append(message.redelivered)
+            if not message.redelivered:
+                await message.nack(requeue=True)
+                return
+            async with message.process():
+                raise ValueError('boom')
+
+        await transport.subscribe('q_test', ['test.#'], flaky, dead_letter='dead.test')
+        await transport.publish({'n': 1}, 'test.event')
+        await transport.join()
+        await transport.close()
+        return transport.dead_letters
+
+    dead_letters = asyncio.run(scenario())
+    assert attempts == [False, True]
+    assert [json.loads(m.body) for m in dead_letters['q_test_dlq']] == [{'n': 1}]
+
+
+def test_in_process_prefetch_keeps_order():
+    seen = []
+
+    async def scenario():
+        transport = InProcessTransport()
+
+        async def slow(message):
+            async with message.process():
+                n = json.loads(message.body)['n']
+                await asyncio.sleep(0.01 if n % 2 == 0 else 0)
+                seen.append(n)
+
+        await transport.subscribe('q_ordered', ['import.#'], slow, prefetch=1)
+        for n in range(6):
+            await transport.publish({'n': n}, 'import.batch')
+        assert await transport.queue_depth('q_ordered') == 6
+        await transport.join()
+        await transport.close()
+
+    asyncio.run(scenario())
+    assert seen == list(range(6))
+
+
+def test_gateway_publishes_through_in_process_transport(monkeypatch):
+    from main import app
+    import core.rabbitmq as rabbitmq
+
+    async def scenario():
+        transport = InProcessTransport()
+        events = []
+
+        async def handler(message):
+            async with message.process():
+                events.append(json.loads(message.body))
+
+        await transport.subscribe('q_inventory', ['order.created'], handler)
+        monkeypatch.setattr(rabbitmq, '_transport', transport)
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+            resp = await client.post('/orders', json=ORDER)
+        await transport.join()
+        await transport.close()
+        return resp, events
+
+    resp, events = asyncio.run(scenario())
+    assert resp.status_code == 202
+    assert [e['data']['order_id'] for e in events] == [resp.json()['order_id']]
+
+
+def test_in_process_depth_counts_messages_in_flight():
+    async def scenario():
+        transport = InProcessTransport()
+        release = asyncio.Event()
+
+        async def stuck(message):
+            async with message.process():
+                await release.wait()
+
+        # Sin prefetch todo pasa a in_flight enseguida: igual debe verse como backlog
+        await transport.subscribe('q_unbounded', ['order.created'], stuck)
+        for n in range(10):
+            await transport.publish({'n': n}, 'order.created')
+        await asyncio.sleep(0.01)
+        assert len(transport.queues['q_unbounded'].in_flight) == 10
+        assert await transport.queue_depth('q_unbounded') == 10
+
+        release.set()
+        await transport.join()
+        assert await transport.queue_depth('q_unbounded') == 0
+        await transport.close()
+
+    asyncio.run(scenario())
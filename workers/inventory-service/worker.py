@@ -1,46 +1,62 @@
 import asyncio
-import aio_pika
 import json
 import os
-import psycopg2
-import time
 import random
 
-# Configuración DB
-DB_HOST = os.getenv("DB_HOST", "postgres")
-DB_USER = os.getenv("DB_USER", "admin")
-DB_PASS = os.getenv("DB_PASS", "secretpassword")
-DB_NAME = "integrahub"
-
-# Variable global para el exchange (para poder publicar desde la función)
-EXCHANGE_OBJ = None
+from common.db import get_db_connection
+from common.schema import maintain_partitions
+from common import diagnostics
+from common.startup import mark_ready, start_worker
+
+# Transporte de eventos global (para poder publicar desde la función)
+TRANSPORT = None
+
+# Cada cuánto se revisan las particiones futuras de orders
+PARTITION_CHECK_INTERVAL = 24 * 60 * 60
+# Pedidos en proceso a la vez. Acotado para que el resto del backlog quede "ready" en
+# q_inventory, que es la profundidad que mira el control de admisión del gateway (503).
+# Con el pago simulado de ~5 s el techo es INVENTORY_PREFETCH / 5 pedidos/s (200 -> 40/s);
+# cada pedido en espera es solo una tarea asyncio (no retiene conexión a Postgres)
+INVENTORY_PREFETCH = int(os.getenv("INVENTORY_PREFETCH", "200"))
+
+async def maintain_partitions_periodically():
+    while True:
+        await asyncio.sleep(PARTITION_CHECK_INTERVAL)
+        try:
+            await asyncio.to_thread(maintain_partitions)
+        except Exception as e:
+            print(f" [!] Error creando particiones de orders: {e}")
 
-def get_db_connection():
-    return psycopg2.connect(host=DB_HOST, user=DB_USER, password=DB_PASS, dbname=DB_NAME)
+def reserve_order(order_id, customer_id):
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO orders (order_id, customer_id, status, amount) VALUES (%s, %s, %s, %s)",
+            (order_id, customer_id, 'RESERVED', random.uniform(100, 500))
+        )
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
 
-def init_db():
+def confirm_order(order_id):
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS orders (
-                id SERIAL PRIMARY KEY,
-                order_id VARCHAR(50) NOT NULL,
-                customer_id VARCHAR(50),
-                status VARCHAR(20),
-                amount DECIMAL(10, 2),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        """)
+        # order_keys da el created_at y Postgres solo toca la partición de ese mes
+        cur.execute(
+            """UPDATE orders SET status = 'CONFIRMED', updated_at = NOW()
+               WHERE order_id = %s
+                 AND created_at = (SELECT created_at FROM order_keys WHERE order_id = %s)""",
+            (order_id, order_id)
+        )
         conn.commit()
         cur.close()
+    finally:
         conn.close()
-        print(" [v] Base de datos SQL inicializada.")
-    except Exception as e:
-        print(f" [!] Esperando a Postgres... ({e})")
 
-async def process_order(message: aio_pika.IncomingMessage):
+async def process_order(message):
     async with message.process():
         body = json.loads(message.body)
         data = body.get('data', {})
@@ -50,15 +66,10 @@ async def process_order(message: aio_pika.IncomingMessage):
         print(f" [1/3] 📦 Procesando inventario para: {order_id}")
         
         try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            
+            # psycopg2 es bloqueante: lo sacamos del event loop (en single_node.py
+            # comparte el loop con el gateway y el resto de los workers)
             # 1. RESERVAR
-            cur.execute(
-                "INSERT INTO orders (order_id, customer_id, status, amount) VALUES (%s, %s, %s, %s)",
-                (order_id, customer_id, 'RESERVED', random.uniform(100, 500))
-            )
-            conn.commit()
+            await asyncio.to_thread(reserve_order, order_id, customer_id)
             print(f"       ✅ Inventario Reservado.")
 
             # 2. SIMULAR PAGO (Espera 5 segundos sin bloquear el hilo)
@@ -66,77 +77,47 @@ async def process_order(message: aio_pika.IncomingMessage):
             await asyncio.sleep(5) 
             
             # 3. CONFIRMAR
-            cur.execute(
-                "UPDATE orders SET status = 'CONFIRMED', updated_at = NOW() WHERE order_id = %s",
-                (order_id,)
-            )
-            conn.commit()
-            cur.close()
-            conn.close()
+            await asyncio.to_thread(confirm_order, order_id)
             print(f" [3/3] 🏁 Pedido CONFIRMADO.")
 
             # --- PUBLICAR EVENTO DE CONFIRMACIÓN (Pub/Sub) ---
-            if EXCHANGE_OBJ:
+            if TRANSPORT:
                 event_confirmation = {
                     "event_type": "OrderConfirmed",
                     "data": { "order_id": order_id, "status": "CONFIRMED", "customer_id": customer_id }
                 }
                 # Publicamos a la routing key "order.confirmed"
-                await EXCHANGE_OBJ.publish(
-                    aio_pika.Message(body=json.dumps(event_confirmation).encode()),
-                    routing_key="order.confirmed" 
-                )
-                print(f"       📣 Evento 'OrderConfirmed' publicado a RabbitMQ.")
+                await TRANSPORT.publish(event_confirmation, "order.confirmed")
+                print(f"       📣 Evento 'OrderConfirmed' publicado.")
             else:
-                print(" [!] ERROR CRÍTICO: El objeto Exchange no está inicializado.")
+                print(" [!] ERROR CRÍTICO: El transporte de eventos no está inicializado.")
 
         except Exception as e:
             print(f" [!] Error procesando orden: {e}")
 
-async def main():
+async def setup(transport):
+    """Suscribe el worker al transporte (AMQP en su contenedor o en memoria en single_node.py)."""
     # USAMOS LA VARIABLE GLOBAL
-    global EXCHANGE_OBJ
-    
-    rmq_host = os.getenv("RABBITMQ_HOST", "rabbitmq")
-    rmq_user = os.getenv("RABBITMQ_DEFAULT_USER", "user")
-    rmq_pass = os.getenv("RABBITMQ_DEFAULT_PASS", "password")
-    
-    time.sleep(5) # Espera inicial para asegurar que Postgres esté listo
-    init_db()
-
-    connection_url = f"amqp://{rmq_user}:{rmq_pass}@{rmq_host}/"
-    connection = await aio_pika.connect_robust(connection_url)
-    channel = await connection.channel()
-
-    # 1. Declarar el Exchange de "Muertos" (DLX)
-    dlx_exchange = await channel.declare_exchange(
-        "dlx.events", aio_pika.ExchangeType.DIRECT
+    global TRANSPORT
+    TRANSPORT = transport
+
+    # Escuchamos los eventos de creación ("order.created"). Si el handler falla
+    # el mensaje va a q_inventory_dlq (routing key "dead.inventory" en dlx.events)
+    await transport.subscribe(
+        "q_inventory", ["order.created"], process_order,
+        dead_letter="dead.inventory", prefetch=INVENTORY_PREFETCH
     )
 
-    # 2. Declarar la Cola de "Muertos" (DLQ)
-    dlq_queue = await channel.declare_queue("q_inventory_dlq", durable=True)
-    await dlq_queue.bind(dlx_exchange, routing_key="dead.inventory")
-
-    # 3. Declarar la Cola Principal CON CONFIGURACIÓN DLQ
-    args = {
-        "x-dead-letter-exchange": "dlx.events",
-        "x-dead-letter-routing-key": "dead.inventory"
-    }
-    
-    # --- AQUÍ ESTABA EL ERROR ANTES ---
-    # Asignamos el exchange a la variable GLOBAL
-    EXCHANGE_OBJ = await channel.declare_exchange(
-        "integrahub.events", aio_pika.ExchangeType.TOPIC
-    )
-
-    # Declaramos la cola y la unimos al exchange global
-    queue = await channel.declare_queue("q_inventory", durable=True, arguments=args)
-    
-    # Escuchamos los eventos de creación ("order.created")
-    await queue.bind(EXCHANGE_OBJ, routing_key="order.created")
+async def main():
+    # Detector de bloqueos del loop + profiler (SIGUSR2), solo con INTEGRAHUB_DIAGNOSTICS=1
+    diagnostics.install("inventory-service")
+    # Espera a Postgres (aplicando el esquema) y a RabbitMQ con backoff, en paralelo
+    transport = await start_worker("Inventory Worker")
+    await setup(transport)
+    mark_ready("Inventory Worker")
 
     print(' [*] Inventory Worker LISTO (con DLQ activa). Esperando pedidos...')
-    await queue.consume(process_order)
+    partitions_task = asyncio.create_task(maintain_partitions_periodically())
     await asyncio.Future()
 
 if __name__ == "__main__":
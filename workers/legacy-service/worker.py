@@ -1,84 +1,438 @@
+import asyncio
+import json
 import time
 import os
+import io
+import gzip
+import mmap
 import shutil
-import pandas as pd
 import psycopg2
+from psycopg2.extras import execute_values
 from datetime import datetime
 
+from common.csvrecords import read_record
+from common.db import get_db_connection
+from common import diagnostics
+from common.startup import mark_ready, start_worker
+
 # Configuración
-INBOX_DIR = "/app/inbox"
-PROCESSED_DIR = "/app/processed"
-ERROR_DIR = "/app/error"
+INBOX_DIR = os.getenv("INBOX_DIR", "/app/inbox")
+PROCESSED_DIR = os.getenv("PROCESSED_DIR", "/app/processed")
+ERROR_DIR = os.getenv("ERROR_DIR", "/app/error")
+
+# Formatos soportados y tamaño de cada bloque (también es la granularidad del checkpoint)
+SUPPORTED_EXTENSIONS = (".csv", ".csv.gz", ".parquet")
+CHUNK_ROWS = int(os.getenv("LEGACY_CHUNK_ROWS", "50000"))
+REQUIRED_COLS = ['order_id', 'customer_id', 'amount']
+# Límites de las columnas de orders (VARCHAR(50) y DECIMAL(10, 2))
+MAX_ID_LENGTH = 50
+MAX_AMOUNT = 99_999_999.99
+
+def file_key(filepath):
+    # Nombre + tamaño + mtime: un reinicio retoma el mismo archivo,
+    # pero si se vuelve a dejar el archivo en el inbox se carga desde cero.
+    st = os.stat(filepath)
+    return f"{os.path.basename(filepath)}:{st.st_size}:{st.st_mtime_ns}"
+
+def load_checkpoint(conn, key):
+    cur = conn.cursor()
+    cur.execute("SELECT position, rows_imported FROM legacy_import_checkpoints WHERE file_key = %s", (key,))
+    result = cur.fetchone()
+    cur.close()
+    return result if result else (0, 0)
+
+def clear_checkpoint(key):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM legacy_import_checkpoints WHERE file_key = %s", (key,))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+def validate_chunk(df, first_row=0):
+    """Reglas de negocio de la carga histórica. Devuelve (filas válidas, filas rechazadas)."""
+    import pandas as pd
+
+    amounts = pd.to_numeric(df['amount'], errors='coerce')
+    # Una sola fila fuera de los límites de la tabla haría fallar el INSERT de todo el bloque
+    amounts = amounts.round(2)
+    valid = (
+        (amounts > 0) & (amounts <= MAX_AMOUNT)
+        & df['order_id'].notna()
+        & (df['order_id'].astype(str).str.len() <= MAX_ID_LENGTH)
+        & (df['customer_id'].isna() | (df['customer_id'].astype(str).str.len() <= MAX_ID_LENGTH))
+    )
+
+    rejected = int((~valid).sum())
+    if rejected:
+        sample = (first_row + (~valid).to_numpy().nonzero()[0][:5]).tolist()
+        print(f"      ⚠️ {rejected} filas con monto inválido, order_id vacío o campos demasiado largos "
+              f"(ej. filas {sample}). Saltando.")
 
-DB_HOST = os.getenv("DB_HOST", "postgres")
-DB_USER = os.getenv("DB_USER", "admin")
-DB_PASS = os.getenv("DB_PASS", "secretpassword")
-DB_NAME = "integrahub"
+    customers = df.loc[valid, 'customer_id']
+    rows = list(zip(
+        df.loc[valid, 'order_id'].astype(str).tolist(),
+        customers.astype(object).where(customers.notna(), None).tolist(),
+        amounts[valid].astype(float).tolist(),
+    ))
+    return rows, rejected
+
+def load_chunk(conn, key, rows, position):
+    """Inserta un bloque y avanza el checkpoint en la MISMA transacción.
+
+    Si el proceso muere a mitad de archivo, lo ya confirmado nunca se vuelve a insertar.
+    Devuelve los pedidos insertados (order_keys descarta en silencio los repetidos).
+    """
+    cur = conn.cursor()
+    inserted = 0
+    if rows:
+        # RETURNING solo devuelve las filas que entraron; con fetch=True se juntan todas las páginas
+        inserted = len(execute_values(
+            cur,
+            "INSERT INTO orders (order_id, customer_id, status, amount) VALUES %s ON CONFLICT DO NOTHING RETURNING 1",
+            rows,
+            template="(%s, %s, 'IMPORTED', %s)",
+            page_size=1000,
+            fetch=True
+        ))
+    cur.execute("""
+        INSERT INTO legacy_import_checkpoints (file_key, position, rows_imported, updated_at)
+        VALUES (%s, %s, %s, NOW())
+        ON CONFLICT (file_key) DO UPDATE SET
+            position = EXCLUDED.position,
+            rows_imported = legacy_import_checkpoints.rows_imported + EXCLUDED.rows_imported,
+            updated_at = NOW();
+    """, (key, position, inserted))
+    conn.commit()
+    cur.close()
+    return inserted
+
+# --- LECTORES POR FORMATO ---
+# Cada lector genera (DataFrame, posición) donde la posición es lo que se guarda
+# como checkpoint: offset en bytes (sin comprimir) para CSV, número de fila para Parquet.
+
+def _check_columns(columns):
+    if not all(col in columns for col in REQUIRED_COLS):
+        raise ValueError(f"Faltan columnas requeridas: {REQUIRED_COLS}")
+
+def _iter_csv_chunks(stream, start_offset):
+    # pandas se importa recién cuando hay un archivo que procesar (arranque rápido)
+    import pandas as pd
+
+    header = stream.readline()
+    _check_columns(pd.read_csv(io.BytesIO(header), nrows=0).columns)
+    if start_offset > stream.tell():
+        stream.seek(start_offset)
+
+    while True:
+        lines = []
+        while len(lines) < CHUNK_ROWS:
+            # Un campo entre comillas puede contener saltos de línea: leemos el registro completo
+            line = read_record(stream.readline)
+            if not line:
+                break
+            lines.append(line)
 
-def get_db_connection():
-    return psycopg2.connect(host=DB_HOST, user=DB_USER, password=DB_PASS, dbname=DB_NAME)
+        if not lines:
+            return
+        df = pd.read_csv(io.BytesIO(header + b"".join(lines)), dtype={'order_id': str, 'customer_id': str})
+        yield df, stream.tell()
+
+def _iter_plain_csv(filepath, start_offset):
+    # mmap: el sistema operativo pagina el archivo bajo demanda, no se carga en memoria
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("Archivo vacío")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            yield from _iter_csv_chunks(mm, start_offset)
+
+def _iter_gzip_csv(filepath, start_offset):
+    # Descompresión en streaming: seek() avanza descomprimiendo sin escribir a disco
+    with gzip.open(filepath, 'rb') as gz:
+        yield from _iter_csv_chunks(gz, start_offset)
+
+def _iter_parquet(filepath, start_row):
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(filepath)
+    _check_columns(pf.schema_arrow.names)
+
+    # Saltamos row groups completos ya importados sin leerlos
+    row_groups, position = [], 0
+    for i in range(pf.num_row_groups):
+        num_rows = pf.metadata.row_group(i).num_rows
+        if not row_groups and position + num_rows <= start_row:
+            position += num_rows
+            continue
+        row_groups.append(i)
+
+    if not row_groups:
+        return
+    for batch in pf.iter_batches(batch_size=CHUNK_ROWS, row_groups=row_groups, columns=REQUIRED_COLS):
+        df = batch.to_pandas()
+        if position < start_row:
+            df = df.iloc[start_row - position:]
+        position += batch.num_rows
+        if len(df):
+            yield df, position
+
+def iter_chunks(filepath, start):
+    if filepath.endswith(".csv.gz"):
+        return _iter_gzip_csv(filepath, start)
+    if filepath.endswith(".parquet"):
+        return _iter_parquet(filepath, start)
+    return _iter_plain_csv(filepath, start)
 
 def process_csv(filepath):
     print(f" [📄] Procesando archivo: {os.path.basename(filepath)}...")
-    
-    try:
-        # 1. Validar formato (Pandas)
-        df = pd.read_csv(filepath)
-        required_cols = ['order_id', 'customer_id', 'amount']
-        
-        # Validar columnas
-        if not all(col in df.columns for col in required_cols):
-            raise ValueError(f"Faltan columnas requeridas: {required_cols}")
 
+    conn = None
+    key = None
+    try:
+        key = file_key(filepath)
         conn = get_db_connection()
-        cur = conn.cursor()
+        start, rows_inserted = load_checkpoint(conn, key)
+        if start:
+            print(f"      ↪️ Reanudando desde checkpoint (posición {start}, {rows_inserted} pedidos ya cargados)")
+
+        rows_seen = 0
+        for df, position in iter_chunks(filepath, start):
+            # 1. Validar (mismas reglas para todos los formatos)
+            rows, _ = validate_chunk(df, first_row=rows_seen)
+            rows_seen += len(df)
+
+            # 2. Cargar bloque + checkpoint (ETL)
+            rows_inserted += load_chunk(conn, key, rows, position)
 
-        rows_inserted = 0
-        
-        # 2. Iterar y Cargar (ETL)
-        for index, row in df.iterrows():
-            try:
-                # Validación de Datos: Monto debe ser positivo
-                if row['amount'] <= 0:
-                    print(f"      ⚠️ Fila {index}: Monto inválido ({row['amount']}). Saltando.")
-                    continue
-
-                # Insertar en DB (Simulando una carga masiva histórica)
-                cur.execute(
-                    "INSERT INTO orders (order_id, customer_id, status, amount) VALUES (%s, %s, %s, %s) ON CONFLICT DO NOTHING",
-                    (row['order_id'], row['customer_id'], 'IMPORTED', row['amount'])
-                )
-                rows_inserted += 1
-            except Exception as row_error:
-                print(f"      ❌ Error en fila {index}: {row_error}")
-
-        conn.commit()
-        cur.close()
         conn.close()
+        clear_checkpoint(key)
         print(f" [✅] Carga completada. {rows_inserted} pedidos importados.")
         return True
 
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        # Postgres caído o reiniciándose: el archivo no tiene nada de malo. Se queda en
+        # /inbox con su checkpoint y el próximo escaneo retoma desde el último bloque.
+        print(f" [⏳] Sin conexión con Postgres procesando archivo, se reintenta luego: {e}")
+        if conn is not None and not conn.closed:
+            conn.close()
+        return None
+
     except Exception as e:
         print(f" [!] Error crítico procesando archivo: {e}")
+        if conn is not None:
+            conn.close()
+        # El archivo se mueve a /error con otro nombre (otra file_key): su checkpoint ya no
+        # serviría. Lo ya cargado se queda; al volver a dejarlo en /inbox se carga desde
+        # cero y order_keys descarta los pedidos repetidos.
+        if key is not None:
+            try:
+                clear_checkpoint(key)
+            except Exception as e:
+                print(f" [!] No se pudo borrar el checkpoint de {key}: {e}")
         return False
 
-def main():
-    # Asegurar directorios
-    os.makedirs(PROCESSED_DIR, exist_ok=True)
-    os.makedirs(ERROR_DIR, exist_ok=True)
-    
-    print(" [*] Legacy Watcher iniciado. Monitoreando carpeta /inbox...")
+# --- IMPORTACIONES POR API (POST /imports en el gateway) ---
+# Los lotes se validan y se guardan en legacy_import_staging; recién con ImportCompleted
+# pasan a orders en una sola transacción. ImportFailed (subida cortada o CSV inválido a
+# mitad) descarta lo acumulado. El avance se informa al gateway con eventos import_status.*
+
+# Transporte con el que se consumen los lotes (para publicar el avance)
+TRANSPORT = None
+# Días que se guarda el resultado de cada importación (para responder a reentregas)
+IMPORT_RESULT_RETENTION_DAYS = int(os.getenv("IMPORT_RESULT_RETENTION_DAYS", "7"))
+
+def stage_chunk(conn, key, rows, rejected, seq):
+    """Guarda un lote en staging y avanza el checkpoint (seq) en la MISMA transacción."""
+    cur = conn.cursor()
+    if rows:
+        execute_values(
+            cur,
+            "INSERT INTO legacy_import_staging (import_key, seq, order_id, customer_id, amount) VALUES %s",
+            [(key, seq, *row) for row in rows],
+            page_size=1000
+        )
+    cur.execute("""
+        INSERT INTO legacy_import_checkpoints (file_key, position, rows_imported, rows_rejected, updated_at)
+        VALUES (%s, %s, %s, %s, NOW())
+        ON CONFLICT (file_key) DO UPDATE SET
+            position = EXCLUDED.position,
+            rows_imported = legacy_import_checkpoints.rows_imported + EXCLUDED.rows_imported,
+            rows_rejected = legacy_import_checkpoints.rows_rejected + EXCLUDED.rows_rejected,
+            updated_at = NOW();
+    """, (key, seq, len(rows), rejected))
+    conn.commit()
+    cur.close()
+
+def _finish_import(cur, key, status, loaded=0, duplicated=0, rejected=0, error=None):
+    """Cierra una importación en la transacción en curso: borra staging y checkpoint y deja
+    el resultado en legacy_import_results (lo que marca que terminó)."""
+    cur.execute("DELETE FROM legacy_import_staging WHERE import_key = %s", (key,))
+    cur.execute("DELETE FROM legacy_import_checkpoints WHERE file_key = %s", (key,))
+    cur.execute("""
+        INSERT INTO legacy_import_results (import_key, status, rows_loaded, rows_duplicated, rows_rejected, error)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (import_key) DO NOTHING
+    """, (key, status, loaded, duplicated, rejected, error))
+    # Pasado este plazo ya no llegan reentregas: los resultados viejos se olvidan
+    cur.execute(
+        "DELETE FROM legacy_import_results WHERE finished_at < NOW() - %s * INTERVAL '1 day'",
+        (IMPORT_RESULT_RETENTION_DAYS,)
+    )
+
+def discard_import(conn, key, rejected=0, error=None):
+    cur = conn.cursor()
+    _finish_import(cur, key, 'ABORTED', rejected=rejected, error=error)
+    conn.commit()
+    cur.close()
+
+def publish_import(conn, key, staged, rejected):
+    """Pasa lo acumulado en staging a orders. Devuelve (pedidos cargados, duplicados)."""
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO orders (order_id, customer_id, status, amount)
+        SELECT order_id, customer_id, 'IMPORTED', amount
+        FROM legacy_import_staging WHERE import_key = %s
+        ORDER BY seq
+    """, (key,))
+    # order_keys descarta los pedidos repetidos: rowcount son los que entraron de verdad
+    loaded = cur.rowcount
+    _finish_import(cur, key, 'LOADED', loaded, staged - loaded, rejected)
+    conn.commit()
+    cur.close()
+    return loaded, staged - loaded
+
+def load_import_progress(conn, key):
+    """(último lote, filas en staging, filas rechazadas) de una importación por API."""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT position, rows_imported, rows_rejected FROM legacy_import_checkpoints WHERE file_key = %s",
+        (key,)
+    )
+    result = cur.fetchone()
+    cur.close()
+    return result if result else (0, 0, 0)
+
+def load_import_result(conn, key):
+    """Resultado registrado de una importación ya terminada: (routing key, evento) o None."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT status, rows_loaded, rows_duplicated, rows_rejected, error
+        FROM legacy_import_results WHERE import_key = %s
+    """, (key,))
+    result = cur.fetchone()
+    cur.close()
+    if result is None:
+        return None
+    status, loaded, duplicated, rejected, error = result
+    if status == 'LOADED':
+        return "import_status.loaded", {
+            "rows_loaded": loaded,
+            "rows_duplicated": duplicated,
+            "rows_rejected": rejected,
+        }
+    return "import_status.aborted", {"error": error, "rows_staged": 0}
+
+def load_import_batch(body):
+    """Procesa un evento de importación del gateway. Devuelve (routing key, evento) de avance o None."""
+    data = body.get('data', {})
+    import_id = data.get('import_id')
+    key = f"upload:{import_id}"
+    event_type = body.get('event_type')
+
+    conn = get_db_connection()
+    try:
+        finished = load_import_result(conn, key)
+        if finished is not None:
+            if event_type in ("ImportCompleted", "ImportFailed"):
+                # Reentrega del broker: quizá el aviso anterior no llegó a publicarse
+                print(f"      ↪️ Importación {import_id} ya terminada. Reenviando su resultado.")
+                return finished
+            print(f"      ↪️ Lote {data.get('seq')} de {import_id} llegó con la importación terminada. Ignorando.")
+            return None
+
+        position, staged, rejected = load_import_progress(conn, key)
+
+        if event_type == "ImportFailed":
+            error = data.get('error')
+            discard_import(conn, key, rejected, error)
+            print(f" [🗑️] Importación {import_id} cancelada: {staged} filas en staging descartadas.")
+            return "import_status.aborted", {"error": error, "rows_staged": 0}
 
+        if event_type == "ImportCompleted":
+            batches = data.get('batches', 0)
+            if position != batches:
+                # Algún lote (o todos) terminó en la DLQ: no se publica una importación incompleta
+                error = f"Solo {position} de {batches} lotes llegaron al legacy-service"
+                discard_import(conn, key, rejected, error)
+                print(f" [!] Importación {import_id} descartada: {error}")
+                return "import_status.aborted", {"error": error, "rows_staged": 0}
+            # Con batches == 0 (solo cabecera) se cierra como LOADED vacía
+            loaded, duplicated = publish_import(conn, key, staged, rejected)
+            print(f" [✅] Importación {import_id} completada. {loaded} pedidos importados "
+                  f"({duplicated} repetidos, {rejected} rechazados).")
+            return "import_status.loaded", {
+                "rows_loaded": loaded,
+                "rows_duplicated": duplicated,
+                "rows_rejected": rejected,
+            }
+
+        # El checkpoint guarda el último lote confirmado: un reenvío del broker se ignora
+        if data['seq'] <= position:
+            print(f"      ↪️ Lote {data['seq']} de {import_id} ya cargado. Ignorando.")
+            return None
+
+        import pandas as pd
+        df = pd.DataFrame(data['rows'], columns=data['columns'])
+        rows, batch_rejected = validate_chunk(df, first_row=data.get('first_row', 0))
+        stage_chunk(conn, key, rows, batch_rejected, data['seq'])
+        return "import_status.staged", {
+            "batches_staged": data['seq'],
+            "rows_staged": staged + len(rows),
+            "rows_rejected": rejected + batch_rejected,
+        }
+    finally:
+        conn.close()
+
+async def process_import_batch(message):
+    async with message.process():
+        body = json.loads(message.body)
+        # psycopg2 es bloqueante: lo sacamos del event loop
+        result = await asyncio.to_thread(load_import_batch, body)
+        if result and TRANSPORT is not None:
+            routing_key, data = result
+            import_id = body.get('data', {}).get('import_id')
+            await TRANSPORT.publish({
+                "event_type": "ImportStatus",
+                "correlation_id": import_id,
+                "data": {"import_id": import_id, **data},
+            }, routing_key)
+
+async def consume_imports(transport):
+    global TRANSPORT
+    TRANSPORT = transport
+    # Un lote a la vez (prefetch 1): los lotes de una importación se cargan en orden
+    await transport.subscribe(
+        "q_legacy_imports", ["import.#"], process_import_batch,
+        dead_letter="dead.legacy_imports", prefetch=1
+    )
+    print(" [*] Escuchando importaciones por API (import.#)...")
+
+def watch_inbox():
+    print(" [*] Legacy Watcher iniciado. Monitoreando carpeta /inbox...")
     while True:
         # Escanear carpeta
-        files = [f for f in os.listdir(INBOX_DIR) if f.endswith('.csv')]
-        
+        files = [f for f in os.listdir(INBOX_DIR) if f.endswith(SUPPORTED_EXTENSIONS)]
+
         for filename in files:
             filepath = os.path.join(INBOX_DIR, filename)
-            
+
             # Procesar
             success = process_csv(filepath)
-            
+            if success is None:
+                continue  # error transitorio: se queda en /inbox y se reintenta
+
             # Mover archivo
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             if success:
@@ -92,5 +446,17 @@ def main():
 
         time.sleep(5)  # Esperar 5 segundos antes de volver a mirar
 
+async def main():
+    # Asegurar directorios
+    os.makedirs(PROCESSED_DIR, exist_ok=True)
+    os.makedirs(ERROR_DIR, exist_ok=True)
+
+    diagnostics.install("legacy-service")
+    transport = await start_worker("Legacy Watcher")
+    await consume_imports(transport)
+    mark_ready("Legacy Watcher")
+    # El watcher de archivos es síncrono (pandas/psycopg2): corre en su propio hilo
+    await asyncio.to_thread(watch_inbox)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
@@ -1,5 +1,4 @@
 import asyncio
-import aio_pika
 import json
 import os
 import aiohttp
@@ -12,6 +11,9 @@ from tenacity import (
     retry_if_exception_type
 )
 
+from common import diagnostics
+from common.startup import mark_ready, start_worker
+
 # Configuración de Logs
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -83,7 +85,7 @@ async def send_to_slack(text):
 
 # --- PROCESAMIENTO DE MENSAJES ---
 
-async def process_notification(message: aio_pika.IncomingMessage):
+async def process_notification(message):
     async with message.process():
         body = json.loads(message.body)
         event_type = body.get('event_type')
@@ -105,26 +107,20 @@ async def process_notification(message: aio_pika.IncomingMessage):
         if slack_message:
             await send_to_slack(slack_message)
 
-async def main():
-    rmq_host = os.getenv("RABBITMQ_HOST", "rabbitmq")
-    rmq_user = os.getenv("RABBITMQ_DEFAULT_USER", "user")
-    rmq_pass = os.getenv("RABBITMQ_DEFAULT_PASS", "password")
-    
-    connection_url = f"amqp://{rmq_user}:{rmq_pass}@{rmq_host}/"
-    
-    # Lógica de reconexión robusta para RabbitMQ (Infraestructura Resiliente)
-    connection = await aio_pika.connect_robust(connection_url)
-    channel = await connection.channel()
+async def setup(transport):
+    # Todos los eventos de pedidos (order.created, order.confirmed, ...)
+    await transport.subscribe("q_notifications", ["order.#"], process_notification)
 
-    exchange = await channel.declare_exchange(
-        "integrahub.events", aio_pika.ExchangeType.TOPIC
-    )
+async def main():
+    diagnostics.install("notification-service")
 
-    queue = await channel.declare_queue("q_notifications", durable=True)
-    await queue.bind(exchange, routing_key="order.#")
+    # Lógica de reconexión robusta para RabbitMQ (Infraestructura Resiliente):
+    # se espera al broker con backoff y la conexión queda como connect_robust
+    transport = await start_worker("Notification Worker", postgres=False)
+    await setup(transport)
+    mark_ready("Notification Worker")
 
     logger.info(' [*] Notification Worker (Resilient) esperando eventos...')
-    await queue.consume(process_notification)
     await asyncio.Future()
 
 if __name__ == "__main__":